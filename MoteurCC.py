@@ -1,11 +1,89 @@
 import numpy as np
 from math import pi
-import matplotlib.pyplot as plt
+from functools import lru_cache
+from .historique import Tampon
+from .instrumentation import Instruments, AttributInstruments
+from .controleur import ControleurPID
+
+
+def expm(A, ordre=18):
+    """Exponentielle de matrice (ou d'une pile de matrices (..., n, n)) par mise à l'échelle
+    et élévations au carré d'une série de Taylor"""
+    A = np.asarray(A, dtype=float)
+    norme = np.abs(A).sum(axis=-1).max() if A.size else 0.
+    s = int(np.ceil(np.log2(norme))) + 1 if norme > 0.5 else 0
+    X = A / 2.**s
+    E = np.broadcast_to(np.eye(A.shape[-1]), A.shape).copy()
+    terme = E.copy()
+    for k in range(1, ordre):
+        terme = np.matmul(terme, X) / k
+        E += terme
+    for _ in range(s):
+        E = np.matmul(E, E)
+    return E
+
+
+def matricesZOH(R, L, kc, ke, J, f, dt):
+    """Discrétisation exacte (bloqueur d'ordre zéro) du moteur CC d'état x = (courant, vitesse) :
+    x[k+1] = Ad.x[k] + Bd.U[k]. Les paramètres peuvent être des tableaux (M,) : Ad (M,2,2), Bd (M,2).
+    Pour L = 0 le courant est algébrique, i = (U - ke*omega)/R, et seule la vitesse est intégrée."""
+    R, L, kc, ke, J, f, dt = np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float))
+                                                   for p in (R, L, kc, ke, J, f, dt)))
+    m = R.shape[0]
+    Ad = np.zeros((m, 2, 2))
+    Bd = np.zeros((m, 2))
+
+    ind = L > 0
+    if ind.any():
+        Li = L[ind]
+        M = np.zeros((Li.shape[0], 3, 3))   # système augmenté [[A, B], [0, 0]]
+        M[:, 0, 0] = -R[ind]/Li
+        M[:, 0, 1] = -ke[ind]/Li
+        M[:, 1, 0] = kc[ind]/J[ind]
+        M[:, 1, 1] = -f[ind]/J[ind]
+        M[:, 0, 2] = 1/Li
+        E = expm(M*dt[ind][:, None, None])
+        Ad[ind] = E[:, :2, :2]
+        Bd[ind] = E[:, :2, 2]
+
+    ind = ~ind
+    if ind.any():
+        a = -(kc[ind]*ke[ind]/R[ind] + f[ind])/J[ind]
+        b = kc[ind]/(R[ind]*J[ind])
+        ad = np.exp(a*dt[ind])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bd = np.where(a != 0, (ad-1)/a*b, b*dt[ind])
+        Ad[ind, 1, 1] = ad
+        Ad[ind, 0, 1] = -ke[ind]*ad/R[ind]
+        Bd[ind, 1] = bd
+        Bd[ind, 0] = (1-ke[ind]*bd)/R[ind]
+    return Ad, Bd
+
+
+@lru_cache(maxsize=256)
+def discretisation(R, L, kc, ke, J, f, dt):
+    """matricesZOH pour un seul moteur, mise en cache par jeu de paramètres et pas de temps"""
+    Ad, Bd = matricesZOH(R, L, kc, ke, J, f, dt)
+    Ad, Bd = Ad[0], Bd[0]
+    Ad.setflags(write=False)
+    Bd.setflags(write=False)
+    return Ad, Bd
+
+
+@lru_cache(maxsize=256)
+def constantesAnalytiques(R, kc, ke, J, f):
+    """gain statique K et constante de temps tau du modèle sans inductance, par jeu de paramètres"""
+    K = kc/(ke * kc + R * f)
+    tau = R * J / (ke * kc + R * f)
+    return K, tau
 
 
 class MoteurCC(object):
     """Modèle numérique du moteur à courant continu, avec Um comme entrée,
         et comme vitesse omega et couple gamma en sortie"""
+
+    instruments = AttributInstruments()
+
     def __init__(self, Um, name, gamma=0, omega=0., R=1, L=0.001, kc=0.01, ke=0.01, J=0.01, f=0.1):
         self.tension = Um
         self.resistance = R
@@ -14,74 +92,182 @@ class MoteurCC(object):
         self.const_fcem = ke    # const de la fcem
         self.inertie = J    # inertie du rotor
         self.frot_visq = f   # const frot visqueux
-        self.couple = np.array((0,gamma))
-        self.vitesse = np.array((0,omega))
-        self.courant = np.array((0,0))
-        self.vitesseAna = np.array((0,0))
+        self._couple = Tampon((0, gamma))
+        self._vitesse = Tampon((0, omega))
+        self._courant = Tampon((0, 0))
+        self._vitesseAna = Tampon((0, 0))
         self.nom = name
+        self.instruments = None
+
+    # Historiques exposés comme tableaux NumPy (vues sans copie sur les tampons)
+    @property
+    def couple(self):
+        return self._couple.valeurs
+
+    @couple.setter
+    def couple(self, valeurs):
+        self._couple = Tampon(valeurs)
+
+    @property
+    def vitesse(self):
+        return self._vitesse.valeurs
+
+    @vitesse.setter
+    def vitesse(self, valeurs):
+        self._vitesse = Tampon(valeurs)
+
+    @property
+    def courant(self):
+        return self._courant.valeurs
+
+    @courant.setter
+    def courant(self, valeurs):
+        self._courant = Tampon(valeurs)
+
+    @property
+    def vitesseAna(self):
+        return self._vitesseAna.valeurs
+
+    @vitesseAna.setter
+    def vitesseAna(self, valeurs):
+        self._vitesseAna = Tampon(valeurs)
+
+    def reserver(self, nb_pas):
+        """préalloue les historiques pour nb_pas pas de simulation (par ex. duree/dt)"""
+        for tampon in (self._couple, self._vitesse, self._courant, self._vitesseAna):
+            tampon.reserver(nb_pas)
+
+    def etat(self, historique=False):
+        """état du moteur (paramètres et historiques, ou seulement les dernières valeurs)"""
+        return {'parametres': (self.tension, self.resistance, self.inductance, self.const_couple,
+                               self.const_fcem, self.inertie, self.frot_visq),
+                'couple': self._couple.etat(historique), 'vitesse': self._vitesse.etat(historique),
+                'courant': self._courant.etat(historique), 'vitesseAna': self._vitesseAna.etat(historique)}
+
+    def restaurerEtat(self, etat):
+        (self.tension, self.resistance, self.inductance, self.const_couple,
+         self.const_fcem, self.inertie, self.frot_visq) = etat['parametres']
+        for nom in ('couple', 'vitesse', 'courant', 'vitesseAna'):
+            getattr(self, '_' + nom).restaurerEtat(etat[nom])
 
     def EqElec(self, tension):
         """Equation electrique : Um(t) = E(t) + R*i(t)
          Hypothese : inductance L = 0
          Simulation avec tension Um en entrée et courant i en sortie."""
-        courant_i = (tension-self.const_fcem*self.vitesse[-1])/self.resistance
-        #self.courant.np.append(courant_i)
-        self.courant = np.append(self.courant, ((courant_i)))
+        courant_i = (tension-self.const_fcem*self._vitesse.dernier())/self.resistance
+        self._courant.ajouter(courant_i)
 
     def EqElec_induct(self, dt, tension):
         """ Equation electrique : Um(t) = E(t) + R*i(t) + L*(di(t)/dt)
          Simulation avec tension Um en entrée et courant i en sortie."""
 
-        courant_i = (dt/self.inductance)*tension-self.const_fcem*self.vitesse[-1]+self.courant[-1]*\
+        courant_i = (dt/self.inductance)*tension-self.const_fcem*self._vitesse.dernier()+self._courant.dernier()*\
                     (self.inductance/dt-self.resistance)
 
-        self.courant = np.append(self.courant, ((courant_i)))
+        self._courant.ajouter(courant_i)
 
     def EqMoteur(self):
         """ Equation du moteur : gamma(t) = k_c * i(t)"""
-        couple_gamma = self.const_couple*self.courant[-1]
-        #self.couple.np.append(couple_gamma)
-        self.couple = np.append(self.couple, ((couple_gamma)))
+        couple_gamma = self.const_couple*self._courant.dernier()
+        self._couple.ajouter(couple_gamma)
 
     def EqMeca(self, dt):
         """Equation mecanique : J*(dV(t)/dt)+f*V(t) = gamma(t)
         avec V(t) ==> vitesse de rotation omega du moteur
         simulation avec couple gamma en entrée et vitesse omega en sortie"""
-        vitesse_suivante = (dt/self.inertie)*self.couple[-1]+self.vitesse[-1]*(1-self.frot_visq*(step/self.inertie))
-        #self.vitesse.append(vitesse_suivante)
-        self.vitesse = np.append(self.vitesse, ((vitesse_suivante)))
+        vitesse_suivante = (dt/self.inertie)*self._couple.dernier()+self._vitesse.dernier()*(1-self.frot_visq*(dt/self.inertie))
+        self._vitesse.ajouter(vitesse_suivante)
 
+    @Instruments.pasInstrumente('moteurs_avances', 'moteurs')
     def calcVit(self, dt, tension):
         self.EqElec(tension)
         self.EqMoteur()
         self.EqMeca(dt)
 
+    @Instruments.pasInstrumente('moteurs_avances', 'moteurs')
     def calcVit_induct(self, dt, tension):
         self.EqElec_induct(dt, tension)
         self.EqMoteur()
         self.EqMeca(dt)
 
+    @Instruments.pasInstrumente('moteurs_avances', 'moteurs')
+    def calcVit_zoh(self, dt, tension):
+        """Pas exact pour une tension constante sur dt (bloqueur d'ordre zéro) : stable quel que soit dt.
+        Avec L = 0 on retrouve le modèle de calcVit, sinon celui de calcVit_induct."""
+        Ad, Bd = discretisation(self.resistance, self.inductance, self.const_couple, self.const_fcem,
+                                self.inertie, self.frot_visq, dt)
+        i = self._courant.dernier()
+        w = self._vitesse.dernier()
+        courant_i = Ad[0, 0]*i + Ad[0, 1]*w + Bd[0]*tension
+        vitesse_suivante = Ad[1, 0]*i + Ad[1, 1]*w + Bd[1]*tension
+        self._courant.ajouter(courant_i)
+        self._couple.ajouter(self.const_couple*courant_i)
+        self._vitesse.ajouter(vitesse_suivante)
+
+    def constantes(self):
+        """(K, tau) de la solution analytique, mis en cache par jeu de paramètres"""
+        return constantesAnalytiques(self.resistance, self.const_couple, self.const_fcem, self.inertie,
+                                     self.frot_visq)
+
     def analytical(self, t, tension):
         """solution analytique du problème sous l'hypothèse L=0"""
-        K = self.const_couple/(self.const_fcem * self.const_couple + self.resistance * self.frot_visq)
-        tau = self.resistance * self.inertie / (self.const_fcem * self.const_couple + self.resistance * self.frot_visq)
+        K, tau = self.constantes()
         speed = K*(1-np.exp(-t/tau))*tension
-        #self.vitesseAna.append(speed)
-        self.vitesseAna = np.append(self.vitesseAna,((speed)))
+        self._vitesseAna.ajouter(speed)
         return None
 
+    def analyticalGrille(self, t, tension, instants=None):
+        """Solution analytique (L=0, départ au repos) sur tout un tableau de temps t en un appel.
+        Sans instants : K*(1-exp(-t/tau))*tension élément par élément, comme analytical (tension
+        scalaire ou tableau de même forme que t).
+        Avec instants : tension est constante par morceaux, tension[j] à partir de instants[j]
+        (nulle avant instants[0]), et la réponse est obtenue par superposition des échelons."""
+        K, tau = self.constantes()
+        t = np.asarray(t, dtype=float)
+        if instants is None:
+            return K*(1-np.exp(-t/tau))*np.asarray(tension, dtype=float)
+
+        instants = np.asarray(instants, dtype=float)
+        niveaux = np.asarray(tension, dtype=float)
+        sauts = np.diff(niveaux, prepend=0.)
+        # S[j] = somme des sauts déjà amortis jusqu'à instants[j] (une opération par morceau)
+        S = np.empty_like(sauts)
+        acc = 0.
+        for j in range(len(sauts)):
+            if j:
+                acc *= np.exp(-(instants[j]-instants[j-1])/tau)
+            acc += sauts[j]
+            S[j] = acc
+        seg = np.searchsorted(instants, t, side='right') - 1
+        speed = np.zeros_like(t)
+        actif = seg >= 0
+        j = seg[actif]
+        speed[actif] = K*(niveaux[j] - S[j]*np.exp(-(t[actif]-instants[j])/tau))
+        return speed
+
     #def couple(self):
 
 
 class SimuMotCC(object):
-    motors = []
+    instruments = AttributInstruments()
 
     def __init__(self, nom):
         self.nom = nom
+        self.motors = []    # propre à chaque instance : deux simulateurs ne partagent pas leur état
+        self.correcteurs = {}   # nom du moteur -> ControleurPID utilisé par ctrlPI
+        self.instruments = None
 
     def addMot(self,mot):
         """ajout d'un moteur dans le simulateur"""
         self.motors.append(mot)
+        if self.instruments is not None:
+            mot.instruments = self.instruments
+
+    def instrumenter(self, instruments):
+        """Instruments (ou None) pour le simulateur, ses moteurs et les banques qu'il construit"""
+        self.instruments = instruments
+        for m in self.motors:
+            m.instruments = instruments
 
     def rmKMot(self, mot):
         """retrait d'un moteur du simulateur"""
@@ -91,29 +277,79 @@ class SimuMotCC(object):
             else:
                 print('No motor named ' + mot + ' in simulateur ' + self.nom + '.')
 
+    def etat(self, historique=False):
+        """état de tous les moteurs et correcteurs, par nom"""
+        return {'moteurs': {m.nom: m.etat(historique) for m in self.motors},
+                'correcteurs': {nom: c.etat() for nom, c in self.correcteurs.items()}}
+
+    def restaurerEtat(self, etat):
+        """les correcteurs créés après la capture sont retirés, ceux de l'instantané recréés au besoin"""
+        for m in self.motors:
+            if m.nom in etat['moteurs']:
+                m.restaurerEtat(etat['moteurs'][m.nom])
+        correcteurs = {}
+        for nom, e in etat['correcteurs'].items():
+            c = self.correcteurs.get(nom)
+            if c is None:
+                c = ControleurPID(0., antisaturation=None)
+            c.restaurerEtat(e)
+            correcteurs[nom] = c
+        self.correcteurs = correcteurs
+
+    def banque(self, noms=None, historique=False):
+        """Banque vectorisée construite à partir des moteurs (tous, ou ceux dont le nom est donné)"""
+        from .banque_moteurs import BanqueMoteurs    # import local : banque_moteurs importe ce module
+        if noms is None:
+            b = BanqueMoteurs(self.motors, historique)
+        else:
+            par_nom = {m.nom: m for m in self.motors}
+            b = BanqueMoteurs([par_nom[n] for n in noms], historique)
+        b.instruments = self.instruments
+        return b
+
+    def simulBanque(self, dt, duree, tension, methode='zoh', noms=None, vit_des=None, Kp=0., Ki=0.):
+        """Simule tous les moteurs ensemble sous les tensions tension (scalaire ou (M,)), ou,
+        si vit_des est donné, en boucle fermée P/PI par moteur. Renvoie la banque."""
+        b = self.banque(noms, historique=True)
+        t = 0
+        while t < duree:
+            if vit_des is None:
+                b.pas(dt, tension, methode)
+            else:
+                b.pasControle(dt, vit_des, Kp, Ki, methode)
+            t += dt
+        b.ecrireHistoriques()
+        return b
+
+    @Instruments.phaseInstrumentee('correcteur')
     def ctrlP(self, vit_act, vit_des, P):
         volt = P * (vit_des - vit_act)
 
         return volt
 
+    @Instruments.phaseInstrumentee('correcteur')
     def ctrlPI(self, mot, vit_act, vit_des, kp, ki, dt=0.01):
-        for m in self.motors:
-            if m.nom == mot:
-                vit_des = [vit_des]
-                voltP = kp * (vit_des[-1] - m.vitesse[-1])
-                voltI = (dt/ki) * sum(vit_des-m.vitesse)
+        """Correcteur PI du moteur nommé mot : kp*e + (1/ki)*intégrale de e (ki : constante de temps
+        intégrale). L'intégrale est tenue à jour pas à pas par un ControleurPID propre au moteur."""
+        pi_mot = self.correcteurs.get(mot)
+        if pi_mot is None:
+            pi_mot = self.correcteurs[mot] = ControleurPID(kp, 1/ki, antisaturation=None)
+        pi_mot.kp, pi_mot.ki = kp, 1/ki
+        volt = pi_mot.commande(vit_des, vit_act, dt)
+
+        return volt
 
     def simul(self, name, dt, duree, tens):
         for m in self.motors:
             if m == name:
                 #t = [0]
-                tt = np.array([0,0])
-                while tt[-1] < duree:
-                    print('aaa')
+                m.reserver(int(duree/dt)+1)
+                tt = Tampon((0, 0), int(duree/dt)+3)
+                while tt.dernier() < duree:
                     #t.append(t[-1]+dt)
-                    tt = np.append(tt, (tt[-1] + dt))
-                    m.analytical(tt[-1], tens)
+                    tt.ajouter(tt.dernier() + dt)
                     m.calcVit(dt, tens)
+                m._vitesseAna.ajouterBloc(m.analyticalGrille(tt.valeurs[2:], tens))
 
         return None
 
@@ -122,40 +358,64 @@ class SimuMotCC(object):
         for m in self.motors:
             if m == name:
                 t = [0]
-                tt = np.array((0,0))
-                while tt[-1] < duree:
+                m.reserver(int(duree/dt)+1)
+                tt = Tampon((0, 0), int(duree/dt)+3)
+                tensions = Tampon((), int(duree/dt)+1)
+                while tt.dernier() < duree:
                     #t.append(t[-1]+dt)
-                    tt = np.append(tt, ((tt[-1]+dt)))
-                    tens = self.ctrlP(m.vitesse[-1], vitesse, Kp)
+                    tt.ajouter(tt.dernier()+dt)
+                    tens = self.ctrlP(m._vitesse.dernier(), vitesse, Kp)
+                    tensions.ajouter(tens)
+                    m.calcVit(dt, tens)
+                m._vitesseAna.ajouterBloc(m.analyticalGrille(tt.valeurs[2:], tensions.valeurs))
+                return tt.valeurs
+        return None
 
-                    m.analytical(tt[-1], tens)
+    def simul_ctrlPI(self, name, dt, duree, vitesse, Kp, Ki, correcteur=None):
+        """Boucle fermée PI (ou avec le ControleurPID correcteur s'il est donné) du moteur name (son nom,
+        comme pour ctrlPI, ou l'objet MoteurCC). Chaque appel repart d'une intégrale nulle pour le
+        correcteur PI du moteur ; correcteur garde son propre état."""
+        for m in self.motors:
+            if m.nom == name or m is name:
+                if m.nom in self.correcteurs:
+                    self.correcteurs[m.nom].reinitialiser()
+                t = [0]
+                m.reserver(int(duree/dt)+1)
+                while t[-1] < duree:
+                    t.append(t[-1]+dt)
+                    if correcteur is None:
+                        tens = self.ctrlPI(m.nom, m._vitesse.dernier(), vitesse, Kp, Ki, dt)
+                    else:
+                        tens = correcteur.commande(vitesse, m._vitesse.dernier(), dt)
                     m.calcVit(dt, tens)
-        return tt
-    #
-    # def simul_ctrlPI(self, name, dt, duree, vitesse, Kp):
-    #     for m in self.motors:
-    #         if m == name:
-    #             t = [0]
-    #             while t[-1] < duree:
-    #                 t.append(t[-1]+dt)
-    #                 tens = self.ctrlPI(m.vitesse[-1], vitesse, Kp)+dt*
-    #
-    #                 m.analytical(t[-1], tens)
-    #                 m.calcVit(dt,tens)
-    #     return t
+                return t
+        return None
 
     def simul_induct(self, name, dt, duree, tens):
         for m in self.motors:
             if m == name:
                 t = [0]
+                m.reserver(int(duree/dt)+1)
                 while t[-1] < duree:
                     t.append(t[-1]+dt)
-                    m.analytical(t[-1], tens)
                     m.calcVit_induct(dt, tens)
+                m._vitesseAna.ajouterBloc(m.analyticalGrille(t[1:], tens))
+        return t
+
+    def simul_zoh(self, name, dt, duree, tens):
+        for m in self.motors:
+            if m == name:
+                t = [0]
+                m.reserver(int(duree/dt)+1)
+                while t[-1] < duree:
+                    t.append(t[-1]+dt)
+                    m.calcVit_zoh(dt, tens)
+                m._vitesseAna.ajouterBloc(m.analyticalGrille(t[1:], tens))
         return t
 
 
-if __name__ == "__main__":  # false lors d'un import
+if __name__ == "__main__":  # false lors d'un import ; démo à lancer avec python -m <paquet>.MoteurCC
+    import matplotlib.pyplot as plt
 
     vit = 150
     prop = 150
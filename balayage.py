@@ -0,0 +1,98 @@
+import os
+import numpy as np
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+from .classes_meca import Vecteur3d
+from .kobuki import Kobuki
+from .environnement import Simulateur
+from .MoteurCC import MoteurCC, SimuMotCC
+
+
+def grille(**valeurs):
+    """Produit cartésien des valeurs de chaque paramètre : grille(kvit=[...], kangle=[...])
+    renvoie la liste des jeux de paramètres sous forme de dictionnaires"""
+    noms = list(valeurs)
+    return [dict(zip(noms, combinaison)) for combinaison in product(*(valeurs[n] for n in noms))]
+
+
+def tirage(distributions, n, graine=None, **fixes):
+    """n jeux de paramètres tirés au hasard (Monte Carlo). distributions associe à chaque nom
+    un couple (min, max) pour un tirage uniforme ou une fonction f(rng, n) -> tableau (n,).
+    Les paramètres fixes sont ajoutés tels quels à chaque jeu."""
+    rng = np.random.default_rng(graine)
+    tirages = {}
+    for nom, loi in distributions.items():
+        if callable(loi):
+            tirages[nom] = np.asarray(loi(rng, n))
+        else:
+            tirages[nom] = rng.uniform(loi[0], loi[1], n)
+    return [dict(fixes, **{nom: float(tirages[nom][k]) for nom in tirages}) for k in range(n)]
+
+
+def metriques(t, y, consigne, tolerance=0.02):
+    """Métriques de réponse indicielle : erreur finale, temps d'établissement (entrée définitive dans
+    la bande ±tolerance autour de la consigne, relative à l'écart initial) et dépassement relatif"""
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ecart = consigne - y[0]
+    amplitude = abs(ecart) if ecart != 0 else 1.
+    hors_bande = np.nonzero(np.abs(y - consigne) > tolerance*amplitude)[0]
+    if hors_bande.size == 0:
+        etablissement = t[0]
+    elif hors_bande[-1] == len(y) - 1:
+        etablissement = np.inf     # jamais établi dans la durée simulée
+    else:
+        etablissement = t[hors_bande[-1] + 1]
+    depassement = max(0., np.max((y - consigne)*np.sign(ecart))/amplitude) if ecart != 0 else 0.
+    return {'erreur_finale': float(abs(consigne - y[-1])),
+            'temps_etablissement': float(etablissement),
+            'depassement': float(depassement)}
+
+
+def executerControleur(params):
+    """Une simulation de Simulateur.controleur avec son propre simulateur.
+    params : x_des, y_des et, en option, kvit, kangle, step, duree, x0, y0, ori0, tolerance"""
+    p = dict(params)
+    tolerance = p.pop('tolerance', 0.02)
+    x0, y0, ori0 = p.pop('x0', 0.), p.pop('y0', 0.), p.pop('ori0', 0.)
+    rob = Kobuki(pos=Vecteur3d(x0, y0), ori=ori0, nom='rob')
+    simu = Simulateur('balayage')
+    simu.addKobuki(rob)
+    simu.controleur('rob', **p)
+
+    h = rob.historique
+    cible = np.array((p['x_des'], p['y_des']))
+    direction = cible - (x0, y0)
+    d0 = np.linalg.norm(direction)
+    # avancement le long de la direction initiale vers la cible (mesure le dépassement)
+    avance = ((h.x - x0)*direction[0] + (h.y - y0)*direction[1])/(d0 if d0 else 1.)
+    res = metriques(h.t, avance, d0, tolerance)
+    res['erreur_finale'] = float(np.hypot(h.x[-1] - cible[0], h.y[-1] - cible[1]))
+    return res
+
+
+def executerMoteurP(params):
+    """Une simulation de SimuMotCC.simul_ctrlP avec son propre simulateur.
+    params : Kp, vitesse et, en option, dt, duree, tolerance et les paramètres de MoteurCC"""
+    p = dict(params)
+    tolerance = p.pop('tolerance', 0.02)
+    dt, duree = p.pop('dt', 0.01), p.pop('duree', 1)
+    vitesse, Kp = p.pop('vitesse'), p.pop('Kp')
+    mot = MoteurCC(0, 'mot', **p)
+    env = SimuMotCC('balayage')
+    env.addMot(mot)
+    t = env.simul_ctrlP(mot, dt, duree, vitesse, Kp)
+    return metriques(t[1:], mot.vitesse[1:], vitesse, tolerance)
+
+
+def balayer(fonction, jeux, processus=None, chunksize=None):
+    """Exécute fonction(params) pour chaque jeu de paramètres dans un pool de processus
+    (processus=1 : exécution séquentielle dans le processus courant).
+    Renvoie la liste des (params, résultat) dans l'ordre des jeux."""
+    jeux = list(jeux)
+    if processus == 1:
+        return [(p, fonction(p)) for p in jeux]
+    if chunksize is None:
+        chunksize = max(1, len(jeux)//(4*(processus or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        return list(zip(jeux, pool.map(fonction, jeux, chunksize=chunksize)))
@@ -0,0 +1,219 @@
+import numpy as np
+from .historique import compterAllocation
+from .instrumentation import Instruments, AttributInstruments
+from .MoteurCC import matricesZOH
+
+
+class BanqueMoteurs(object):
+    """Banque de M moteurs CC en structure de tableaux (R, L, kc, ke, J, f) avec l'état
+    (courant, vitesse) de chacun. Chaque pas de temps avance tous les moteurs en une opération NumPy,
+    sur place. analytique : vitesseAna suit en parallèle la solution analytique sans inductance
+    (MoteurCC.analytical) pour les mêmes tensions, bloquées sur chaque pas (données de validation,
+    une mise à jour de plus par pas) ; sinon vitesseAna et les historiques vitesseAna des MoteurCC
+    sont laissés tels quels."""
+
+    instruments = AttributInstruments()
+
+    def __init__(self, moteurs=(), historique=False, capacite=1024, analytique=False):
+        self.moteurs = list(moteurs)
+        self.noms = [m.nom for m in self.moteurs]
+        self.index = {nom: i for i, nom in enumerate(self.noms)}   # nom -> indice dans les tableaux
+
+        self.R = np.array([m.resistance for m in self.moteurs], dtype=float)
+        self.L = np.array([m.inductance for m in self.moteurs], dtype=float)
+        self.kc = np.array([m.const_couple for m in self.moteurs], dtype=float)
+        self.ke = np.array([m.const_fcem for m in self.moteurs], dtype=float)
+        self.J = np.array([m.inertie for m in self.moteurs], dtype=float)
+        self.f = np.array([m.frot_visq for m in self.moteurs], dtype=float)
+        # état (2, M) : courant et vitesse en sont les deux lignes, mises à jour ensemble par pas
+        self._etat = np.array([[m._courant.dernier() for m in self.moteurs],
+                               [m._vitesse.dernier() for m in self.moteurs]], dtype=float).reshape(2, -1)
+        self.courant, self.vitesse = self._etat
+        self.vitesseAna = np.array([m._vitesseAna.dernier() for m in self.moteurs], dtype=float)
+        self.integrale = np.zeros(len(self.moteurs))   # intégrale de l'erreur de vitesse (correcteur PI)
+        self._zoh = {}
+        self._travail = None    # tableaux de travail (4, M) de pas
+        self.t = 0.
+        self._t_ecrit = 0.      # instant du dernier état recopié dans les MoteurCC
+        self.journal = None     # EnregistreurJournal éventuel, alimenté à chaque pas
+        self.instruments = None
+
+        # états enregistrés depuis le dernier ecrireHistoriques, une ligne par pas
+        self.historique = historique
+        self.analytique = analytique
+        self._nb = 0
+        if historique:
+            self._allouerHistorique(capacite, len(self.moteurs))
+
+    def _allouerHistorique(self, capacite, nb):
+        self._hi = np.empty((capacite, nb))
+        self._hw = np.empty((capacite, nb))
+        if self.analytique:
+            self._ha = np.empty((capacite, nb))
+
+    @classmethod
+    def depuisParametres(cls, nb, R=1, L=0.001, kc=0.01, ke=0.01, J=0.01, f=0.1, historique=False,
+                         analytique=False):
+        """Banque de nb moteurs au repos, chaque paramètre étant un scalaire ou un tableau (nb,)"""
+        banque = cls(historique=historique, analytique=analytique)
+        for nom, p in (('R', R), ('L', L), ('kc', kc), ('ke', ke), ('J', J), ('f', f)):
+            setattr(banque, nom, np.array(np.broadcast_to(np.asarray(p, dtype=float), (nb,))))
+        banque._etat = np.zeros((2, nb))
+        banque.courant, banque.vitesse = banque._etat
+        banque.vitesseAna = np.zeros(nb)
+        banque.integrale = np.zeros(nb)
+        if historique:
+            banque._allouerHistorique(1024, nb)
+        return banque
+
+    def __len__(self):
+        return self.vitesse.shape[0]
+
+    def __repr__(self):
+        return 'BanqueMoteurs(' + str(len(self)) + ' moteurs)'
+
+    def invaliderCache(self):
+        """à appeler après une modification des tableaux de paramètres"""
+        self._zoh = {}
+
+    def _matrices(self, dt):
+        """coefficients de la discrétisation exacte pour ce dt, calculés une fois par pas de temps"""
+        if dt not in self._zoh:
+            Ad, Bd = matricesZOH(self.R, self.L, self.kc, self.ke, self.J, self.f, dt)
+            # colonnes de Ad (coefficients du courant, puis de la vitesse) et Bd, en lignes (2, M)
+            self._zoh[dt] = (np.ascontiguousarray(Ad[:, :, 0].T), np.ascontiguousarray(Ad[:, :, 1].T),
+                             np.ascontiguousarray(Bd.T))
+        return self._zoh[dt]
+
+    def _coefficients(self, dt):
+        """coefficients du schéma d'Euler et de la solution analytique pour ce dt, mis en cache comme _matrices"""
+        cle = ('euler', dt)
+        if cle not in self._zoh:
+            K = self.kc/(self.ke*self.kc + self.R*self.f)
+            tau = self.R*self.J/(self.ke*self.kc + self.R*self.f)
+            amorti = np.exp(-dt/tau)
+            self._zoh[cle] = ((dt/self.J)*self.kc, 1 - self.f*(dt/self.J), amorti, K*(1 - amorti))
+        return self._zoh[cle]
+
+    @Instruments.pasInstrumente('moteurs_avances', nombre=len)
+    def pas(self, dt, tension, methode='zoh'):
+        """Avance tous les moteurs d'un pas dt sous les tensions tension (scalaire ou (M,)).
+        methode 'zoh' : discrétisation exacte ; 'euler' : même schéma que MoteurCC.calcVit (L = 0).
+        Les tableaux courant, vitesse (et vitesseAna si analytique) sont mis à jour sur place."""
+        ins = self.instruments
+        i, w = self.courant, self.vitesse
+        if self._travail is None or self._travail.shape[1] != i.shape[0]:
+            self._travail = np.empty((4, i.shape[0]))
+        t1 = self._travail[0]
+        if methode == 'zoh':
+            colonne_i, colonne_w, colonne_u = self._matrices(dt)
+            s1, s2 = self._travail[:2], self._travail[2:]
+            np.multiply(colonne_i, i, out=s1)
+            np.multiply(colonne_w, w, out=s2)
+            s1 += s2
+            np.multiply(colonne_u, tension, out=s2)
+            s1 += s2
+            self._etat[...] = s1
+        elif methode == 'euler':
+            keuler, amort_euler = self._coefficients(dt)[:2]
+            np.multiply(self.ke, w, out=t1)
+            np.subtract(tension, t1, out=t1)
+            np.divide(t1, self.R, out=i)
+            w *= amort_euler
+            np.multiply(keuler, i, out=t1)
+            w += t1
+        else:
+            raise ValueError('methode inconnue : ' + str(methode))
+        if self.analytique:
+            amorti, gain = self._coefficients(dt)[2:]
+            self.vitesseAna *= amorti
+            np.multiply(gain, tension, out=t1)
+            self.vitesseAna += t1
+        self.t += dt
+        if ins is not None:
+            ins.etape('moteurs')
+        if self.historique:
+            self._enregistrer()
+            if ins is not None:
+                ins.etape('historique')
+        if self.journal is not None:
+            self.journal.enregistrerBanque(self, self.t)
+            if ins is not None:
+                ins.etape('journal')
+
+    @Instruments.phaseInstrumentee('correcteur')
+    def _tensions(self, dt, consigne, Kp, Ki, correcteur):
+        """tensions du correcteur PI par moteur, ou du ControleurPID correcteur s'il est donné"""
+        if correcteur is not None:
+            return correcteur.commande(consigne, self.vitesse, dt)
+        erreur = consigne - self.vitesse
+        self.integrale += erreur*dt
+        return Kp*erreur + Ki*self.integrale
+
+    def pasControle(self, dt, consigne, Kp, Ki=0., methode='zoh'):
+        """Un pas en boucle fermée sur la vitesse avec un correcteur P (Ki = 0) ou PI par moteur :
+        consigne, Kp et Ki sont des scalaires ou des tableaux (M,). Renvoie les tensions appliquées."""
+        tension = self._tensions(dt, consigne, Kp, Ki, None)
+        self.pas(dt, tension, methode)
+        return tension
+
+    def pasCorrecteur(self, dt, consigne, correcteur, methode='zoh'):
+        """Un pas en boucle fermée sur la vitesse avec un ControleurPID travaillant sur les tableaux (M,)
+        (gains, saturation et anti-emballement par moteur). Renvoie les tensions appliquées."""
+        tension = self._tensions(dt, consigne, 0., 0., correcteur)
+        self.pas(dt, tension, methode)
+        return tension
+
+    def etat(self, historique=False):
+        """copie des paramètres et de l'état de tous les moteurs (historique est ignoré)"""
+        return {nom: np.copy(getattr(self, nom))
+                for nom in ('R', 'L', 'kc', 'ke', 'J', 'f', 'courant', 'vitesse', 'vitesseAna', 'integrale', 't')}
+
+    def restaurerEtat(self, etat):
+        for nom, valeur in etat.items():
+            setattr(self, nom, np.copy(valeur) if np.ndim(valeur) else float(valeur))
+        self._etat = np.array((self.courant, self.vitesse))
+        self.courant, self.vitesse = self._etat
+        self._zoh = {}
+        self._nb = 0
+
+    @property
+    def couple(self):
+        return self.kc*self.courant
+
+    def _enregistrer(self):
+        i = self._nb
+        if i == self._hi.shape[0]:
+            noms = ('_hi', '_hw', '_ha') if self.analytique else ('_hi', '_hw')
+            for nom in noms:
+                ancien = getattr(self, nom)
+                nouveau = np.empty((2*ancien.shape[0], ancien.shape[1]))
+                nouveau[:i] = ancien
+                setattr(self, nom, nouveau)
+            compterAllocation(len(noms)*nouveau.nbytes)
+        self._hi[i] = self.courant
+        self._hw[i] = self.vitesse
+        if self.analytique:
+            self._ha[i] = self.vitesseAna
+        self._nb = i + 1
+
+    def ecrireHistoriques(self):
+        """Recopie les états calculés dans les historiques des MoteurCC (un bloc par moteur).
+        Sans historique, seul l'état courant est ajouté, s'il ne l'a pas déjà été."""
+        k = self._nb
+        for j, m in enumerate(self.moteurs):
+            if self.historique:
+                if k:
+                    m._courant.ajouterBloc(self._hi[:k, j])
+                    m._couple.ajouterBloc(self.kc[j]*self._hi[:k, j])
+                    m._vitesse.ajouterBloc(self._hw[:k, j])
+                    if self.analytique:
+                        m._vitesseAna.ajouterBloc(self._ha[:k, j])
+            elif self.t != self._t_ecrit:
+                m._courant.ajouter(self.courant[j])
+                m._couple.ajouter(self.kc[j]*self.courant[j])
+                m._vitesse.ajouter(self.vitesse[j])
+                if self.analytique:
+                    m._vitesseAna.ajouter(self.vitesseAna[j])
+        self._nb = 0
+        self._t_ecrit = self.t
@@ -0,0 +1,250 @@
+"""Mesures de performance des chemins critiques (cinématique, moteurs, flottes, tracé).
+
+Chaque cas est chronométré plusieurs fois (temps médian retenu), puis rejoué sous tracemalloc
+pour le pic de mémoire. Le débit est aussi exprimé en indice : rapporté à celui d'une boucle
+d'étalonnage (Python et petites opérations NumPy) mesurée dans la même session, il dépend peu
+de la machine ; c'est lui que garde la référence, avec le pic de mémoire.
+Sans affichage ni réseau (matplotlib en Agg, pygame sur le pilote vidéo factice) :
+
+    python -m <paquet>.benchmarks                 # mesure et compare à bench_baseline.json
+    python -m <paquet>.benchmarks --enregistrer   # remplace la référence
+    python -m <paquet>.benchmarks --rapide        # runs courts, pour un contrôle rapide
+
+Le code de sortie est 1 si l'indice d'un cas (ou son pic de mémoire) s'écarte de la référence
+au-delà de la marge --seuil, choisie au-dessus du bruit de mesure d'une machine partagée.
+"""
+import os
+os.environ.setdefault('MPLBACKEND', 'Agg')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import sys
+import json
+import platform
+import tracemalloc
+import warnings
+from contextlib import redirect_stdout
+from time import perf_counter
+import numpy as np
+from .classes_meca import Vecteur3d
+from .kobuki import Kobuki
+from .flotte import Flotte
+from .banque_moteurs import BanqueMoteurs
+from .MoteurCC import MoteurCC, SimuMotCC
+from .environnement import Simulateur
+
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+TAILLES_FLOTTE = (1, 10, 100, 1000, 10000)
+TAILLES_BANQUE = (1, 100, 10000)
+
+
+# Chaque cas prend l'échelle (1 : complet, plus petit en mode rapide) et renvoie (nb_pas, lancer) :
+# la préparation n'est pas chronométrée, lancer() l'est ; nb_pas compte les pas de robot ou de moteur.
+
+def _robotMCD(echelle, n=100000):
+    n = int(n*echelle)
+    k = Kobuki()
+    return n, lambda: [k.simulMCD(0.01, 1., 1.2) for _ in range(n)]
+
+
+def _robotMCI(echelle, n=100000):
+    n = int(n*echelle)
+    k = Kobuki()
+    return n, lambda: [k.simulMCI(0.01, 1., 0.3) for _ in range(n)]
+
+
+def _robotLong(echelle, n=1000000):
+    n = int(n*echelle)
+    k = Kobuki()
+    return n, lambda: [k.simulMCI(0.01, 1., 0.3) for _ in range(n)]
+
+
+def _robotBloc(echelle, n=1000000):
+    n = int(n*echelle)
+    k = Kobuki()
+    t = np.arange(n)*0.01
+    return n, lambda: k.simulMCIBloc(0.01, 1., np.sin(t))
+
+
+def _flotte(nb):
+    def cas(echelle):
+        nb_pas = int(np.clip(2e6/nb, 200, 20000)*echelle)
+        rng = np.random.default_rng(0)
+        fl = Flotte([Kobuki(nom=str(i), pos=Vecteur3d(*rng.uniform(-10, 10, 2))) for i in range(nb)],
+                    historique=False)
+        cmd = rng.uniform(0, 2, (nb, 2))
+        return nb*nb_pas, lambda: [fl.pasRoues(0.01, cmd) for _ in range(nb_pas)]
+    return cas
+
+
+def _flotteHistorique(echelle, nb=100, nb_pas=10000):
+    nb_pas = int(nb_pas*echelle)
+    fl = Flotte([Kobuki(nom=str(i)) for i in range(nb)])
+    cmd = np.ones((nb, 2))
+
+    def lancer():
+        for _ in range(nb_pas):
+            fl.pasRoues(0.01, cmd)
+        fl.ecrireHistoriques()
+    return nb*nb_pas, lancer
+
+
+def _moteur(methode):
+    def cas(echelle, n=100000):
+        n = int(n*echelle)
+        m = MoteurCC(0, 'm')
+        calc = getattr(m, methode)
+        return n, lambda: [calc(0.001, 5.) for _ in range(n)]
+    return cas
+
+
+def _simuMotCC(echelle, duree=100.):
+    duree *= echelle
+    s = SimuMotCC('bench')
+    m = MoteurCC(0, 'm')
+    s.addMot(m)
+    return int(round(duree/0.001)), lambda: s.simul(m, 0.001, duree, 5.)
+
+
+def _banque(nb):
+    def cas(echelle):
+        nb_pas = int(np.clip(2e6/nb, 200, 20000)*echelle)
+        b = BanqueMoteurs.depuisParametres(nb)
+        u = np.linspace(1, 10, nb)
+        return nb*nb_pas, lambda: [b.pas(0.001, u) for _ in range(nb_pas)]
+    return cas
+
+
+def _trace(echelle, nb_robots=10, n=100000):
+    import matplotlib.pyplot as plt
+    n = int(n*echelle)
+    s = Simulateur('bench')
+    for i in range(nb_robots):
+        k = Kobuki(nom=str(i))
+        k.simulMCIBloc(0.01, 1., np.sin(np.arange(n)*0.01 + i))
+        s.addKobuki(k)
+
+    def lancer():
+        with warnings.catch_warnings(), redirect_stdout(None):
+            warnings.simplefilter('ignore')     # plt.show sans effet sous Agg
+            s.trace()
+        plt.close('all')
+    return nb_robots*n, lancer
+
+
+CAS = dict([('kobuki_simulMCD', _robotMCD), ('kobuki_simulMCI', _robotMCI),
+            ('kobuki_simulMCI_1e6', _robotLong), ('kobuki_simulMCIBloc_1e6', _robotBloc)]
+           + [('flotte_%d' % n, _flotte(n)) for n in TAILLES_FLOTTE]
+           + [('flotte_100_historique', _flotteHistorique)]
+           + [('moteur_' + m, _moteur(m)) for m in ('calcVit', 'calcVit_induct', 'calcVit_zoh')]
+           + [('simuMotCC_simul', _simuMotCC)]
+           + [('banque_%d' % n, _banque(n)) for n in TAILLES_BANQUE]
+           + [('simulateur_trace', _trace)])
+
+
+def calibrer(repetitions=5, n=20000):
+    """débit (itérations/s, médiane de repetitions runs) d'une boucle d'étalonnage mêlant appels Python
+    et opérations NumPy sur de petits tableaux, comme les chemins mesurés"""
+    a = np.zeros(16)
+    b = np.linspace(0, 1, 16)
+    durees = []
+    for _ in range(repetitions):
+        debut = perf_counter()
+        for _ in range(n):
+            a = 0.5*a + np.cos(b)
+        durees.append(perf_counter() - debut)
+    return n/float(np.median(durees))
+
+
+def mesurer(nom, echelle=1., memoire=True, repetitions=5, etalon=None):
+    """chronomètre le cas nom (médiane de repetitions runs, chacun sur des objets neufs), puis le rejoue
+    sous tracemalloc ; renvoie un dictionnaire de résultats (indice : débit rapporté à etalon, voir calibrer)"""
+    durees = []
+    for _ in range(repetitions):
+        nb_pas, lancer = CAS[nom](echelle)
+        debut = perf_counter()
+        lancer()
+        durees.append(perf_counter() - debut)
+    duree = float(np.median(durees))
+    resultat = {'nb_pas': nb_pas, 'duree': duree, 'pas_par_s': nb_pas/duree if duree > 0 else float('inf')}
+    if etalon is not None:
+        resultat['indice'] = resultat['pas_par_s']/etalon
+    if memoire:
+        lancer = CAS[nom](echelle)[1]
+        tracemalloc.start()
+        try:
+            lancer()
+            resultat['pic_memoire'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return resultat
+
+
+def executer(noms=None, echelle=1., memoire=True, repetitions=5, sortie=sys.stdout):
+    etalon = calibrer(repetitions)
+    print('%-26s %12.0f it/s' % ('etalonnage', etalon), file=sortie)
+    resultats = {}
+    for nom in (noms or CAS):
+        resultats[nom] = r = mesurer(nom, echelle, memoire, repetitions, etalon)
+        print('%-26s %12.0f pas/s %9.3f s %9.3g %10s' % (nom, r['pas_par_s'], r['duree'], r['indice'],
+              '%.1f Mo' % (r['pic_memoire']/2**20) if 'pic_memoire' in r else ''), file=sortie)
+    return resultats
+
+
+def comparer(resultats, reference, seuil=0.5, sortie=sys.stdout):
+    """Liste des régressions : indice de débit sous (1 - seuil) fois la référence,
+    ou pic de mémoire au-delà de (1 + seuil) fois la référence (plus 1 Mo de marge)"""
+    regressions = []
+    for nom, r in resultats.items():
+        ref = reference.get(nom)
+        if ref is None:
+            continue
+        rapport = r['indice']/ref['indice']
+        if rapport < 1 - seuil:
+            regressions.append((nom, 'debit', rapport))
+        if 'pic_memoire' in r and 'pic_memoire' in ref:
+            if r['pic_memoire'] > (1 + seuil)*ref['pic_memoire'] + 2**20:
+                regressions.append((nom, 'memoire', r['pic_memoire']/max(ref['pic_memoire'], 1)))
+        print('%-26s x%.2f' % (nom, rapport), file=sortie)
+    for nom, quoi, rapport in regressions:
+        print('REGRESSION %s (%s) : x%.2f' % (nom, quoi, rapport), file=sortie)
+    return regressions
+
+
+def charger(chemin=REFERENCE):
+    with open(chemin) as f:
+        return json.load(f)
+
+
+def enregistrer(resultats, chemin=REFERENCE, echelle=1.):
+    """écrit la référence : indices et pics de mémoire seulement, pas de débits propres à la machine"""
+    cas = {nom: {cle: r[cle] for cle in ('nb_pas', 'indice', 'pic_memoire') if cle in r}
+           for nom, r in resultats.items()}
+    donnees = {'machine': {'python': platform.python_version(), 'numpy': np.__version__},
+               'echelle': echelle, 'cas': cas}
+    with open(chemin, 'w') as f:
+        json.dump(donnees, f, indent=1, sort_keys=True)
+
+
+if __name__ == "__main__":  # false lors d'un import
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmarks des chemins critiques de la simulation')
+    parser.add_argument('cas', nargs='*', help='cas à mesurer (tous par défaut) : ' + ', '.join(CAS))
+    parser.add_argument('--rapide', action='store_true', help='runs dix fois plus courts')
+    parser.add_argument('--sans-memoire', action='store_true', help='pas de passe tracemalloc')
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--reference', default=REFERENCE)
+    parser.add_argument('--enregistrer', action='store_true', help='écrit les résultats comme nouvelle référence')
+    parser.add_argument('--seuil', type=float, default=0.5)
+    args = parser.parse_args()
+
+    echelle = 0.1 if args.rapide else 1.
+    resultats = executer(args.cas or None, echelle, not args.sans_memoire, args.repetitions)
+    if args.enregistrer:
+        enregistrer(resultats, args.reference, echelle)
+    elif os.path.exists(args.reference):
+        reference = charger(args.reference)
+        if reference.get('echelle', 1.) != echelle:
+            print('référence mesurée à une autre échelle (--rapide ?) : pas de comparaison')
+        else:
+            sys.exit(1 if comparer(resultats, reference['cas'], args.seuil) else 0)
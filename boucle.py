@@ -0,0 +1,57 @@
+import numpy as np
+from time import perf_counter
+
+
+class BouclePhysique(object):
+    """Boucle de simulation à pas de physique fixe, découplée de l'affichage.
+    Le temps réel écoulé entre deux images est accumulé et consommé par pas fixes de durée pas ;
+    le reste sert à interpoler l'état affiché entre les deux derniers états calculés.
+    avancer(t, pas) fait un pas de physique ; etat() renvoie une copie de l'état à interpoler."""
+
+    def __init__(self, pas, avancer, etat=None, max_sous_pas=10):
+        self.pas = pas
+        self.avancer = avancer
+        self.etat = etat
+        self.max_sous_pas = max_sous_pas   # au-delà, le retard est abandonné (pas de spirale de rattrapage)
+        self.t = 0.
+        self.nb_pas = 0
+        self.accumulateur = 0.
+        self.precedent = self.courant = etat() if etat is not None else None
+
+    def _pas(self):
+        self.avancer(self.t, self.pas)
+        self.nb_pas += 1
+        self.t = self.nb_pas*self.pas   # pas de dérive due à l'accumulation des arrondis
+
+    def ecoulement(self, dt_reel):
+        """Fait autant de pas fixes que le permet le temps réel écoulé dt_reel et renvoie
+        le coefficient d'interpolation alpha dans [0, 1) entre l'état précédent et le courant"""
+        self.accumulateur += dt_reel
+        n = int(self.accumulateur // self.pas)
+        if n > self.max_sous_pas:
+            self.accumulateur -= (n - self.max_sous_pas)*self.pas
+            n = self.max_sous_pas
+        for i in range(n):
+            if i == n - 1 and self.etat is not None:
+                self.precedent = self.etat()
+            self._pas()
+        self.accumulateur -= n*self.pas
+        if n and self.etat is not None:
+            self.courant = self.etat()
+        return self.accumulateur/self.pas
+
+    def interpole(self, alpha):
+        """état à afficher, interpolé linéairement entre les deux derniers pas de physique"""
+        return self.precedent + alpha*(self.courant - self.precedent)
+
+    def executer(self, duree):
+        """Mode sans affichage : enchaîne les pas fixes aussi vite que possible pendant duree
+        de temps simulé. Renvoie le nombre de pas par seconde de calcul obtenu."""
+        n = int(round(duree/self.pas))
+        debut = perf_counter()
+        for _ in range(n):
+            self._pas()
+        if self.etat is not None:
+            self.precedent = self.courant = self.etat()
+        ecoule = perf_counter() - debut
+        return n/ecoule if ecoule > 0 else np.inf
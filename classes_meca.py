@@ -1,5 +1,10 @@
+import numpy as np
+
+
 class Vecteur3d(object):
     """Définit un vecteur 3D, produit vect avec * et produit scalaire avec **"""
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x=0, y=0, z=0):
         self.x = x
         self.y = y
@@ -12,18 +17,24 @@ class Vecteur3d(object):
         return "Vecteur3d(%g, %g, %g)" % (self.x, self.y, self.z)
 
     def __add__(self, other):
+        if type(other) == Vecteur3dArray:
+            return NotImplemented
         return Vecteur3d(self.x + other.x, self.y + other.y, self.z + other.z)
 
     def __neg__(self):
         return Vecteur3d(-self.x, -self.y, -self.z)
 
     def __sub__(self, other):
-        return self + (-other)
+        if type(other) == Vecteur3dArray:
+            return NotImplemented
+        return Vecteur3d(self.x - other.x, self.y - other.y, self.z - other.z)
 
     def __mul__(self, other):               # produit vectoriel
+        if type(other) == Vecteur3dArray:
+            return NotImplemented
         if type(other) == Vecteur3d:
             X = self.y * other.z - self.z * other.y
-            Y = self.x * other.z - self.z * other.x
+            Y = self.z * other.x - self.x * other.z
             Z = self.x * other.y - self.y * other.x
         else:
             X = other * self.x
@@ -36,6 +47,8 @@ class Vecteur3d(object):
         return self * other
 
     def __pow__(self, other):           # Produit scalaire
+        if type(other) == Vecteur3dArray:
+            return NotImplemented
         if type(other) == Vecteur3d:
             X = self.x * other.x
             Y = self.y * other.y
@@ -84,6 +97,121 @@ class Vecteur3d(object):
         self.z = M.z
 
 
+class Vecteur3dArray(object):
+    """N vecteurs 3D stockés dans un tableau (N,3) de float64, avec les mêmes opérateurs que
+    Vecteur3d appliqués ligne à ligne : produit vect avec * et produit scalaire avec **"""
+    __slots__ = ('v',)
+
+    def __init__(self, v=None):
+        self.v = np.zeros((0, 3)) if v is None else np.asarray(v, dtype=float).reshape(-1, 3)
+
+    @classmethod
+    def depuisVecteurs(cls, vecteurs):
+        """construit le tableau à partir d'une liste de Vecteur3d"""
+        return cls([(u.x, u.y, u.z) for u in vecteurs])
+
+    def versVecteurs(self):
+        """liste de Vecteur3d"""
+        return [Vecteur3d(x, y, z) for x, y, z in self.v.tolist()]
+
+    @property
+    def x(self):
+        return self.v[:, 0]
+
+    @property
+    def y(self):
+        return self.v[:, 1]
+
+    @property
+    def z(self):
+        return self.v[:, 2]
+
+    def __len__(self):
+        return self.v.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return Vecteur3d(*self.v[i].tolist())
+        return Vecteur3dArray(self.v[i])
+
+    def __iter__(self):
+        return iter(self.versVecteurs())
+
+    def __str__(self):
+        return 'Vecteur3dArray(' + str(len(self)) + ' vecteurs)'
+
+    def __repr__(self):
+        return 'Vecteur3dArray(' + repr(self.v) + ')'
+
+    @staticmethod
+    def _valeurs(other):
+        """tableau (N,3) ou (3,) d'un Vecteur3dArray ou d'un Vecteur3d"""
+        if isinstance(other, Vecteur3dArray):
+            return other.v
+        return np.array((other.x, other.y, other.z), dtype=float)
+
+    @staticmethod
+    def _scalaires(other):
+        """scalaire, ou tableau (N,) de scalaires mis en colonne"""
+        other = np.asarray(other, dtype=float)
+        return other[:, None] if other.ndim == 1 else other
+
+    def __add__(self, other):
+        return Vecteur3dArray(self.v + self._valeurs(other))
+
+    def __radd__(self, other):
+        return self + other
+
+    def __neg__(self):
+        return Vecteur3dArray(-self.v)
+
+    def __sub__(self, other):
+        return Vecteur3dArray(self.v - self._valeurs(other))
+
+    def __rsub__(self, other):
+        return Vecteur3dArray(self._valeurs(other) - self.v)
+
+    def __mul__(self, other):               # produit vectoriel
+        if isinstance(other, (Vecteur3d, Vecteur3dArray)):
+            return Vecteur3dArray(np.cross(self.v, self._valeurs(other)))
+        return Vecteur3dArray(self.v * self._scalaires(other))
+
+    def __rmul__(self, other):
+        if isinstance(other, Vecteur3d):
+            return Vecteur3dArray(np.cross(self._valeurs(other), self.v))
+        return self * other
+
+    def __pow__(self, other):           # Produit scalaire
+        if isinstance(other, (Vecteur3d, Vecteur3dArray)):
+            return np.einsum('ij,ij->i', self.v, np.broadcast_to(self._valeurs(other), self.v.shape))
+        return self * other
+
+    def __rpow__(self, other):
+        return self ** other
+
+    def __truediv__(self, other):
+        return Vecteur3dArray(self.v / self._scalaires(other))
+
+    def __eq__(self, other):
+        """égalité ligne à ligne : tableau (N,) de booléens"""
+        return np.all(self.v == self._valeurs(other), axis=-1)
+
+    __hash__ = None
+
+    def mod(self):
+        return np.sqrt(self ** self)
+
+    def norm(self):
+        return Vecteur3dArray(self.v / self.mod()[:, None])
+
+    def normed(self):
+        self.v /= self.mod()[:, None]
+
+    def somme(self):
+        """somme de tous les vecteurs"""
+        return Vecteur3d(*self.v.sum(axis=0).tolist())
+
+
 if __name__ == "__main__":  # false lors d'un import
 
     V1 = Vecteur3d(1, 0, 0)
@@ -121,28 +249,26 @@ class Torseur(object):
         msg = 'Torseur('+str(self.p)+','+str(self.r)+','+str(self.m)+')'
         return msg
 
+    def moment(self, pd=Vecteur3d()):
+        """moment au point pd : M(pd) = M(p) + (p - pd) ^ R"""
+        return self.m + (self.p - pd) * self.r
+
+    def deplace(self, pd=Vecteur3d()):
+        """même torseur réduit au point pd (nouvel objet, self n'est pas modifié)"""
+        return Torseur(pd, self.r, self.moment(pd))
+
     def chgPt(self, pd=Vecteur3d()):
-        md = self.m + (pd - self.p) * self.r
+        md = self.moment(pd)
         self.p = pd
         self.m = md
 
     def __add__(self, other):
-        if self.p != other.p:
-            Ptemp = other.p
-            other.chgPt(self.p)
-
-        S = Torseur(self.p, self.r + other.r, self.m + other.m)
+        m = other.m if self.p == other.p else other.moment(self.p)
+        return Torseur(self.p, self.r + other.r, self.m + m)
 
-        try:
-            other.chgPt(Ptemp)
-        except:
-            pass
-
-        return S
-
-    def __mul__(self, other):
-            chgPt(other, self.p)
-            return float(self.r * other.m + self.m * other.r)
+    def __mul__(self, other):           # comoment
+            m = other.m if self.p == other.p else other.moment(self.p)
+            return float(self.r ** m + self.m ** other.r)
 
     def __neg__(self):
             return Torseur(self.p, -self.r, -self.m)
@@ -151,17 +277,78 @@ class Torseur(object):
             return self + (-other)
 
     def __eq__(self, other):
-        if not (self.p == other.p):
-            Ptemp = other.p
-            other.chgPt(self.p)
+        m = other.m if self.p == other.p else other.moment(self.p)
+        return self.r == other.r and self.m == m
+
+
+class TorseurEnsemble(object):
+    """N torseurs stockés en tableaux (N,3) : points d'application p, résultantes r et moments m.
+    Les opérations (changement de point, somme, comoment) sont vectorisées et ne modifient jamais
+    leurs opérandes."""
+
+    def __init__(self, p, r, m):
+        self.p, self.r, self.m = np.broadcast_arrays(*(np.asarray(a, dtype=float).reshape(-1, 3)
+                                                       for a in (p, r, m)))
+
+    @classmethod
+    def depuisTorseurs(cls, torseurs):
+        torseurs = list(torseurs)
+        return cls([(t.p.x, t.p.y, t.p.z) for t in torseurs], [(t.r.x, t.r.y, t.r.z) for t in torseurs],
+                   [(t.m.x, t.m.y, t.m.z) for t in torseurs])
+
+    def versTorseurs(self):
+        return [Torseur(Vecteur3d(*p), Vecteur3d(*r), Vecteur3d(*m))
+                for p, r, m in zip(self.p.tolist(), self.r.tolist(), self.m.tolist())]
+
+    def __len__(self):
+        return self.r.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return Torseur(Vecteur3d(*self.p[i].tolist()), Vecteur3d(*self.r[i].tolist()),
+                           Vecteur3d(*self.m[i].tolist()))
+        return TorseurEnsemble(self.p[i], self.r[i], self.m[i])
+
+    def __repr__(self):
+        return 'TorseurEnsemble(' + str(len(self)) + ' torseurs)'
+
+    @staticmethod
+    def _points(pd):
+        if isinstance(pd, Vecteur3d):
+            return np.array((pd.x, pd.y, pd.z), dtype=float)
+        if isinstance(pd, Vecteur3dArray):
+            return pd.v
+        return np.asarray(pd, dtype=float)
+
+    def moments(self, pd=Vecteur3d()):
+        """moments (N,3) au point pd (Vecteur3d commun ou tableau (N,3))"""
+        return self.m + np.cross(self.p - self._points(pd), self.r)
+
+    def chgPt(self, pd=Vecteur3d()):
+        """nouvel ensemble réduit au(x) point(s) pd"""
+        return TorseurEnsemble(self._points(pd), self.r, self.moments(pd))
+
+    def somme(self, pd=Vecteur3d()):
+        """torseur résultant, réduit au point pd"""
+        return Torseur(pd, Vecteur3d(*self.r.sum(axis=0).tolist()),
+                       Vecteur3d(*self.moments(pd).sum(axis=0).tolist()))
+
+    def __add__(self, other):
+        """somme terme à terme, réduite aux points de self"""
+        return TorseurEnsemble(self.p, self.r + other.r, self.m + other.moments(self.p))
+
+    def __neg__(self):
+        return TorseurEnsemble(self.p, -self.r, -self.m)
+
+    def __sub__(self, other):
+        return self + (-other)
 
-        S = (self.r == other.r and self.m == other.m)
+    def comoment(self, other):
+        """comoments terme à terme (N,) : R1.M2 + M1.R2, les moments pris aux points de self"""
+        m = other.moments(self.p)
+        return np.einsum('ij,ij->i', self.r, m) + np.einsum('ij,ij->i', self.m, np.broadcast_to(other.r, self.m.shape))
 
-        try:
-            other.chgPt(Ptemp)
-        except:
-            pass
-        return S
+    __mul__ = comoment
 
 
 if __name__ == "__main__":  # false lors d'un import
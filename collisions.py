@@ -0,0 +1,171 @@
+import numpy as np
+
+_DECALAGE = 1 << 20     # les indices de cellule sont décalés pour rester positifs
+_BASE = 1 << 21         # clé d'une cellule = (cx + décalage)*base + (cy + décalage)
+# cellule elle-même et demi-voisinage : chaque paire de cellules voisines n'est visitée qu'une fois
+_VOISINS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class GrilleSpatiale(object):
+    """Hachage spatial sur grille uniforme, en tableaux : les robots sont triés par clé de cellule.
+    L'ordre du pas précédent sert de point de départ au tri (tri stable, quasi linéaire quand
+    peu de robots changent de cellule), d'où une reconstruction incrémentale à chaque pas."""
+
+    def __init__(self, taille_cellule):
+        self.taille_cellule = float(taille_cellule)
+        self.ordre = None
+
+    def construire(self, x, y):
+        cx = np.floor(np.asarray(x)/self.taille_cellule).astype(np.int64)
+        cy = np.floor(np.asarray(y)/self.taille_cellule).astype(np.int64)
+        cles = (cx + _DECALAGE)*_BASE + (cy + _DECALAGE)
+        if self.ordre is None or self.ordre.shape[0] != cles.shape[0]:
+            self.ordre = np.argsort(cles, kind='stable')
+        else:
+            self.ordre = self.ordre[np.argsort(cles[self.ordre], kind='stable')]
+        triees = cles[self.ordre]
+        self.cellules, self.debuts, self.comptes = np.unique(triees, return_index=True, return_counts=True)
+
+    @staticmethod
+    def _produit(debut_a, compte_a, debut_b, compte_b):
+        """toutes les paires de positions (dans l'ordre trié) entre les groupes a et b, vectorisé"""
+        nb = compte_a*compte_b
+        total = int(nb.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        groupe = np.repeat(np.arange(nb.shape[0]), nb)
+        local = np.arange(total) - np.repeat(np.cumsum(nb) - nb, nb)
+        return debut_a[groupe] + local//compte_b[groupe], debut_b[groupe] + local % compte_b[groupe]
+
+    def paires(self):
+        """paires candidates (i, j) d'indices de robots dans la même cellule ou des cellules voisines"""
+        # même cellule : paires i < j
+        ia, ib = self._produit(self.debuts, self.comptes, self.debuts, self.comptes)
+        garde = ia < ib
+        morceaux_a, morceaux_b = [ia[garde]], [ib[garde]]
+        for dx, dy in _VOISINS:
+            voisines = self.cellules + dx*_BASE + dy
+            k = np.searchsorted(self.cellules, voisines)
+            k = np.minimum(k, self.cellules.shape[0] - 1)
+            existe = self.cellules[k] == voisines
+            a = np.nonzero(existe)[0]
+            b = k[existe]
+            ia, ib = self._produit(self.debuts[a], self.comptes[a], self.debuts[b], self.comptes[b])
+            morceaux_a.append(ia)
+            morceaux_b.append(ib)
+        return self.ordre[np.concatenate(morceaux_a)], self.ordre[np.concatenate(morceaux_b)]
+
+
+class Contacts(object):
+    """Contacts d'un pas : paires de robots (i, j) avec la pénétration et la normale de i vers j,
+    et robots touchant un mur"""
+
+    def __init__(self, i, j, penetration, normale, murs):
+        self.i = i
+        self.j = j
+        self.penetration = penetration
+        self.normale = normale
+        self.murs = murs
+
+    def __len__(self):
+        return self.i.shape[0] + self.murs.shape[0]
+
+    def __repr__(self):
+        return 'Contacts(' + str(self.i.shape[0]) + ' entre robots, ' + str(self.murs.shape[0]) + ' avec les murs)'
+
+
+class DetecteurCollisions(object):
+    """Collisions entre empreintes circulaires de robots (rayons (N,)) et avec les murs de l'arène
+    bornes = (xmin, ymin, xmax, ymax), dans l'unité des positions et des rayons (None : pas de murs).
+    Phase large par GrilleSpatiale, phase fine vectorisée.
+    reponse 'arret' : un robot qui s'enfonce dans un contact revient à sa position d'avant le pas
+    (un robot qui s'en dégage, même encore en recouvrement, reste libre) ;
+    'glissement' : les robots sont séparés le long de la normale et bloqués aux murs, la composante
+    tangentielle du mouvement est conservée."""
+
+    def __init__(self, rayons, bornes=None, reponse='glissement', taille_cellule=None):
+        if reponse not in ('arret', 'glissement'):
+            raise ValueError('reponse inconnue : ' + str(reponse))
+        self.rayons = np.asarray(rayons, dtype=float)
+        self.bornes = bornes
+        self.reponse = reponse
+        if taille_cellule is None:
+            taille_cellule = 2*self.rayons.max() if self.rayons.size else 1.
+        self.grille = GrilleSpatiale(taille_cellule)
+
+    @classmethod
+    def pourFlotte(cls, flotte, **options):
+        """empreinte de chaque Kobuki : disque de diamètre l'entraxe dist (bornes dans la même unité)"""
+        return cls(flotte.dist/2, **options)
+
+    def detecter(self, x, y):
+        x = np.asarray(x)
+        y = np.asarray(y)
+        r = self.rayons
+        self.grille.construire(x, y)
+        i, j = self.grille.paires()
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        d2 = dx*dx + dy*dy
+        somme = r[i] + r[j]
+        touche = d2 < somme*somme
+        i, j, dx, dy, d2, somme = i[touche], j[touche], dx[touche], dy[touche], d2[touche], somme[touche]
+        d = np.sqrt(d2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normale = np.where(d[:, None] > 0, np.column_stack((dx, dy))/d[:, None], (1., 0.))
+        if self.bornes is None:
+            murs = np.empty(0, dtype=np.intp)
+        else:
+            murs = np.nonzero(self._enfoncementMurs(x, y) > 0)[0]
+        return Contacts(i, j, somme - d, normale, murs)
+
+    def _enfoncementMurs(self, x, y, indices=slice(None)):
+        """plus grande pénétration de chaque robot dans un mur (négative s'il n'en touche aucun)"""
+        xmin, ymin, xmax, ymax = self.bornes
+        r = self.rayons[indices]
+        return np.maximum(np.maximum(xmin - (x - r), (x + r) - xmax), np.maximum(ymin - (y - r), (y + r) - ymax))
+
+    def appliquer(self, flotte, x_prec, y_prec, actifs=None):
+        """détecte les contacts après un pas de la flotte et applique la réponse ; renvoie les contacts.
+        actifs : masque des robots avancés pendant le pas, les autres restent en place (obstacles fixes)"""
+        contacts = self.detecter(flotte.x, flotte.y)
+        if self.reponse == 'arret':
+            # seuls les contacts qui s'aggravent pendant le pas bloquent : paires qui se rapprochent,
+            # robots qui s'enfoncent davantage dans un mur
+            i, j = contacts.i, contacts.j
+            avant = np.hypot(x_prec[j] - x_prec[i], y_prec[j] - y_prec[i])
+            apres = (self.rayons[i] + self.rayons[j]) - contacts.penetration
+            rapproche = apres < avant
+            m = contacts.murs
+            if m.shape[0]:
+                m = m[self._enfoncementMurs(flotte.x[m], flotte.y[m], m) > self._enfoncementMurs(x_prec[m], y_prec[m], m)]
+            bloques = np.concatenate((i[rapproche], j[rapproche], m))
+            if actifs is not None:
+                bloques = bloques[actifs[bloques]]
+            flotte.x[bloques] = x_prec[bloques]
+            flotte.y[bloques] = y_prec[bloques]
+        else:
+            if actifs is None:
+                part_i = part_j = 0.5
+            else:
+                # pénétration reprise en entier par le seul robot actif d'une paire
+                ai = actifs[contacts.i].astype(float)
+                aj = actifs[contacts.j].astype(float)
+                somme = np.maximum(ai + aj, 1.)
+                part_i, part_j = ai/somme, aj/somme
+            ecart = contacts.penetration[:, None]*contacts.normale
+            np.subtract.at(flotte.x, contacts.i, part_i*ecart[:, 0])
+            np.subtract.at(flotte.y, contacts.i, part_i*ecart[:, 1])
+            np.add.at(flotte.x, contacts.j, part_j*ecart[:, 0])
+            np.add.at(flotte.y, contacts.j, part_j*ecart[:, 1])
+            if self.bornes is None:
+                return contacts
+            xmin, ymin, xmax, ymax = self.bornes
+            r = self.rayons
+            if actifs is None:
+                np.clip(flotte.x, xmin + r, xmax - r, out=flotte.x)
+                np.clip(flotte.y, ymin + r, ymax - r, out=flotte.y)
+            else:
+                flotte.x[actifs] = np.clip(flotte.x[actifs], xmin + r[actifs], xmax - r[actifs])
+                flotte.y[actifs] = np.clip(flotte.y[actifs], ymin + r[actifs], ymax - r[actifs])
+        return contacts
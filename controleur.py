@@ -0,0 +1,65 @@
+import numpy as np
+
+
+class ControleurPID(object):
+    """Correcteur P, PI ou PID à état incrémental (coût constant par pas), avec saturation de sortie
+    et anti-emballement de l'intégrale. Fonctionne sur un scalaire ou sur des tableaux (M,) de moteurs :
+    les gains et bornes peuvent aussi être des tableaux.
+    antisaturation : None, 'blocage' (intégration gelée quand la sortie sature dans le sens de l'erreur)
+    ou 'retrocalcul' (l'intégrale est ramenée de kaw*(u_sat - u) à chaque pas)."""
+
+    def __init__(self, kp, ki=0., kd=0., umin=None, umax=None, antisaturation='blocage', kaw=None):
+        if antisaturation not in (None, 'blocage', 'retrocalcul'):
+            raise ValueError('antisaturation inconnue : ' + str(antisaturation))
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.umin = -np.inf if umin is None else umin
+        self.umax = np.inf if umax is None else umax
+        self.antisaturation = antisaturation
+        self.kaw = kaw      # gain de rétro-calcul, 1/kp par défaut
+        self.reinitialiser()
+
+    def __repr__(self):
+        return 'ControleurPID(kp=' + str(self.kp) + ', ki=' + str(self.ki) + ', kd=' + str(self.kd) + ')'
+
+    def reinitialiser(self):
+        self.integrale = 0.     # intégrale de l'erreur
+        self.erreur = None      # erreur du pas précédent, pour la dérivée
+        self.sortie = 0.
+
+    def etat(self, historique=False):
+        """réglages et état interne (intégrale, erreur précédente, sortie) pour un instantané"""
+        copie = lambda v: v.copy() if isinstance(v, np.ndarray) else v
+        return {nom: copie(getattr(self, nom)) for nom in ('kp', 'ki', 'kd', 'umin', 'umax', 'antisaturation',
+                                                           'kaw', 'integrale', 'erreur', 'sortie')}
+
+    def restaurerEtat(self, etat):
+        for nom, valeur in etat.items():
+            setattr(self, nom, valeur.copy() if isinstance(valeur, np.ndarray) else valeur)
+
+    def commande(self, consigne, mesure, dt):
+        """Calcule la commande pour un pas dt et met à jour l'état du correcteur"""
+        erreur = np.subtract(consigne, mesure)
+        derivee = 0. if self.erreur is None else (erreur - self.erreur)/dt
+        integrale = self.integrale + erreur*dt
+        brute = self.kp*erreur + self.ki*integrale + self.kd*derivee
+        sortie = np.clip(brute, self.umin, self.umax)
+
+        if self.antisaturation == 'blocage':
+            # pas d'intégration tant que la sortie est saturée et que l'erreur l'y pousse encore
+            gele = ((brute > self.umax) & (erreur > 0)) | ((brute < self.umin) & (erreur < 0))
+            integrale = np.where(gele, self.integrale, integrale)
+            sortie = np.clip(self.kp*erreur + self.ki*integrale + self.kd*derivee, self.umin, self.umax)
+        elif self.antisaturation == 'retrocalcul':
+            kaw = self.kaw if self.kaw is not None else 1/np.where(self.kp == 0, 1., self.kp)
+            integrale = integrale + kaw*(sortie - brute)*dt
+
+        if np.ndim(sortie) == 0:
+            sortie = float(sortie)
+            integrale = float(integrale)
+            erreur = float(erreur)
+        self.integrale = integrale
+        self.erreur = erreur
+        self.sortie = sortie
+        return sortie
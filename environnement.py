@@ -1,22 +1,46 @@
-from Kobuki_project.kobuki import Kobuki
+from .kobuki import Kobuki
+from .instrumentation import Instruments, AttributInstruments
+from .flotte import Flotte
+from .boucle import BouclePhysique
+from .collisions import DetecteurCollisions
+from .evenements import PiloteAdaptatif, CibleAtteinte, loiRalliement, angleMod
+from .rendu import exporterHistoriques, AtlasSprites, RenduFlotte
 from math import pi, sin, cos, sqrt
-from matplotlib import pyplot as plt
-import pygame
-import pygame.draw as pygDraw
-from pygame.time import Clock as pygClock
 import numpy as np
 from random import random, randint, seed
+from contextlib import nullcontext
+
+
+def grilleTemps(step, duree):
+    """Instants de commande d'une boucle « while t[-1] < duree: t.append(t[-1]+step) »,
+    obtenus par la même somme cumulée pour avoir exactement le même nombre de pas
+    (aucun pour duree <= 0, comme la boucle)"""
+    t = np.concatenate(((0.,), np.cumsum(np.full(max(int(duree/step), 0)+2, float(step)))))
+    return t[:np.argmax(t >= duree)]
 
 
 class Simulateur(object):
-    robots = []
+    instruments = AttributInstruments()
 
     def __init__(self, nom):
         self.nom = nom
+        self.robots = []    # propre à chaque instance : deux simulateurs ne partagent pas leur état
+        self.instruments = None
 
     def addKobuki(self, K):
         """ajout d'un kobuki dans l'environnement"""
         self.robots.append(K)
+        if self.instruments is not None:
+            K.instruments = self.instruments
+
+    def instrumenter(self, instruments):
+        """Instruments (ou None) pour le simulateur, ses robots et les flottes qu'il construit"""
+        self.instruments = instruments
+        for r in self.robots:
+            r.instruments = instruments
+
+    def _phase(self, nom):
+        return self.instruments.phase(nom) if self.instruments is not None else nullcontext()
 
     def rmKobuki(self, name):
         """retrait d'un kobuki de l'environnement"""
@@ -26,28 +50,29 @@ class Simulateur(object):
             else:
                 print('No Kobuki named ' + name + ' in simulateur ' + self.nom + '.')
 
-    def trace(self):
+    def trace(self, nb_paquets=1000):
         """trace l'ensemble des positions de chaque robot de l'environnement"""
-        plt.figure('Plan de ' + self.nom)
-        for t in self.robots:
-            X = []
-            Y = []
-            for i in t.pos:
-                X.append(i.x)
-                Y.append(i.y)
-            plt.plot(X, Y, color=t.color, label=t.nom)
-            liste_nom = ''
-            for r in self.robots:
-                liste_nom = liste_nom + ' + ' + r.nom
-            print(liste_nom)
-            plt.title('trajectoire de '+liste_nom)
-            plt.xlabel('x')
-            plt.ylabel('y')
-            plt.legend()
-            plt.axis('equal')
-            plt.grid(b=True)
+        from matplotlib import pyplot as plt    # tracé chargé au premier usage : le cœur n'importe que NumPy
+        from .graphes import tracerTrajectoires
+        with self._phase('trace'):
+            fig = plt.figure('Plan de ' + self.nom)
+            ax = fig.gca()
+            tracerTrajectoires(ax, self.robots, nb_paquets)
+        liste_nom = ' + ' + ' + '.join(r.nom for r in self.robots)
+        print(liste_nom)
+        plt.title('trajectoire de '+liste_nom)
+        plt.xlabel('x')
+        plt.ylabel('y')
+        plt.axis('equal')
+        plt.grid(True)
         plt.show()
 
+    def exporterImages(self, dossier, pas=1, **options):
+        """exporte sans affichage les images de la simulation enregistrée (une pose sur pas),
+        en PNG ou en blocs .npy (voir rendu.ExportImages)"""
+        with self._phase('rendu'):
+            return exporterHistoriques(self.robots, dossier, pas, **options)
+
     def controlRoues(self, name, step, vg, vd):
         for r in self.robots:
             if r.nom == name:
@@ -55,20 +80,52 @@ class Simulateur(object):
             else:
                 print('No Kobuki named ' + name + ' in simulateur ' + self.nom + '.')
 
-    def controleur(self, name, x_des, y_des, kvit=0.02, kangle=0.09, step=0.02, duree=50):
+    def controleur(self, name, x_des, y_des, kvit=0.02, kangle=0.09, step=0.02, duree=50, tolerance=None,
+                   adaptatif=False):
+        """Ralliement du point (x_des, y_des) en boucle fermée pendant duree.
+        tolerance : arrêt dès que le robot est à moins de tolerance de la cible ;
+        adaptatif : pas adaptatif (voir rallier), step n'est alors que le pas initial et tolerance vaut
+        0.05 par défaut. Renvoie l'instant d'arrivée (None si la cible n'est pas atteinte)"""
+        if adaptatif:
+            res = self.rallier(x_des, y_des, [name], kvit, kangle, duree, 0.05 if tolerance is None else tolerance,
+                               pas_initial=step)
+            return res.temps[0] if res.evenements[0] == 'cible' else None
         for r in self.robots:
             if r.nom == name:
                 t=[0]
                 while t[-1]<duree:
                     pos_err = np.array((r.pos[-1].x, r.pos[-1].y))-np.array((x_des, y_des))
-                    theta_err = np.arctan2(y_des-r.pos[-1].y, x_des-r.pos[-1].x)
+                    if tolerance is not None and np.linalg.norm(pos_err) <= tolerance:
+                        return t[-1]
+                    # écart entre l'orientation et la direction de la cible
+                    theta_err = angleMod(np.arctan2(y_des-r.pos[-1].y, x_des-r.pos[-1].x) - r.ori[-1])
                     vtrans = kvit * np.linalg.norm(pos_err)
-                    vrot = -kangle * theta_err
+                    vrot = kangle * theta_err
                     r.simulMCI(step, vtrans, vrot)
                     t.append(t[-1]+step)
 
-    def trajSinMCD(self, name, step=0.01, duree=1, a=1, omega=1):
+    def rallier(self, x_des, y_des, noms=None, kvit=0.02, kangle=0.09, duree=50, tolerance=0.05,
+                erreur=1e-3, pas_initial=0.02, pas_max=1., integrateur='arc'):
+        """Ralliement simultané des cibles (x_des, y_des) (scalaires ou un par robot) par la flotte des robots
+        noms, à pas adaptatif (erreur locale par pas sous erreur) : chaque robot s'arrête à la première de ses
+        cibles atteinte à tolerance près, ou après duree. Renvoie le ResultatPilote (événements et instants)."""
+        fl = self.flotte(noms, integrateur=integrateur)
+        evenements = [CibleAtteinte(x_des, y_des, tolerance)] if tolerance is not None else []
+        pilote = PiloteAdaptatif(fl, loiRalliement(x_des, y_des, kvit, kangle), evenements,
+                                 tolerance=erreur, pas_max=pas_max, pas_initial=pas_initial)
+        res = pilote.executer(duree)
+        fl.ecrireHistoriques()
+        return res
+
+    def trajSinMCD(self, name, step=0.01, duree=1, a=1, omega=1, vectorise=False):
         """trajectoire de la forme A *sin(omega*t)"""
+        if vectorise:
+            t = grilleTemps(step, duree)
+            for r in self.robots:
+                if r.nom == name:
+                    r.simulMCDBloc(step, a*np.abs(np.sin(omega*t)), a*np.abs(np.sin((pi/2*omega)+omega*t)))
+            return
+
         t = [0]
 
         while t[-1] < duree:
@@ -79,7 +136,14 @@ class Simulateur(object):
                     r.simulMCD(step, vg, vd)
             t.append(t[-1]+step)
 
-    def trajSinMCI(self, name, step=0.01, duree=1, a=pi/2, omega=1):
+    def trajSinMCI(self, name, step=0.01, duree=1, a=pi/2, omega=1, vectorise=False):
+        if vectorise:
+            t = grilleTemps(step, duree)
+            for r in self.robots:
+                if r.nom == name:
+                    r.simulMCIBloc(step, 1, a*np.sin(omega*t))
+            return
+
         t = [0]
         while t[-1] < duree:
             for r in self.robots:
@@ -89,12 +153,16 @@ class Simulateur(object):
                     r.simulMCI(step, vt, vr)
             t.append(t[-1]+step)
 
-    def trajCirc(self, name, rayon=20, vrot=1, step=0.01, duree=1):
+    def trajCirc(self, name, rayon=20, vrot=1, step=0.01, duree=1, vectorise=False):
         """trajectoire circulaire de rayon donné à un vitesse donnée"""
         for r in self.robots:
             if r.nom == name:
                 v_g = vrot*(rayon+r.dist/2)
                 v_d = vrot*(rayon-r.dist/2)
+                if vectorise:
+                    n = len(grilleTemps(step, duree))
+                    r.simulMCDBloc(step, np.full(n, v_g), np.full(n, v_d))
+                    continue
                 t = [0]
                 while t[-1] < duree:
                     t.append(t[-1]+step)
@@ -110,8 +178,18 @@ class Simulateur(object):
                 d = randint(-2, 5)
                 self.controlRoues(r.nom, step, g, d)
 
-    def goToPos(self, name, x, y, duree=1, step=0.01):
-        """Déplace le robot à la position (x,y) du repère global."""
+    def goToPos(self, name, x, y, duree=1, step=0.01, adaptatif=False):
+        """Déplace le robot à la position (x,y) du repère global.
+        adaptatif : les deux phases (rotation puis translation) étant à commande constante, chacune est
+        intégrée exactement (schéma 'arc') en un seul pas de duree au lieu de duree/step pas."""
+        if adaptatif:
+            for r in self.robots:
+                if r.nom == name:
+                    x0, y0, theta, t = r.historique.derniere()
+                    angle = theta - np.arctan2(y - y0, x - x0)
+                    r.simulMCI(duree, 0, -angle/duree, 'arc')
+                    r.simulMCI(duree, sqrt((x - x0)**2 + (y - y0)**2)/duree, 0, 'arc')
+            return
         for r in self.robots:
             if r.nom == name:
                 t = [0]
@@ -129,7 +207,7 @@ class Simulateur(object):
                     vt = sqrt(dist_x**2 + dist_y**2)
                     r.simulMCI(step, vt/duree, 0)
 
-    def goToPosRandom(self, nb_ite=5, step=0.01, duree=1):
+    def goToPosRandom(self, nb_ite=5, step=0.01, duree=1, adaptatif=False):
         i = 0
         while i < nb_ite:
             i += 1
@@ -137,7 +215,45 @@ class Simulateur(object):
                 seed(a=None, version=2)
                 x = randint(-5+int(r.pos[-1].x), 5+int(r.pos[-1].x))
                 y = randint(-5+int(r.pos[-1].y), 5+int(r.pos[-1].y))
-                self.goToPos(r.nom, x, y, duree, step)
+                self.goToPos(r.nom, x, y, duree, step, adaptatif)
+
+    def etat(self, historique=False):
+        """état de tous les robots, par nom (voir instantane.capturer)"""
+        return {'robots': {r.nom: r.etat(historique) for r in self.robots}}
+
+    def restaurerEtat(self, etat):
+        for r in self.robots:
+            if r.nom in etat['robots']:
+                r.restaurerEtat(etat['robots'][r.nom])
+
+    def flotte(self, noms=None, historique=True, integrateur='euler'):
+        """Flotte vectorisée construite à partir des robots (tous, ou ceux dont le nom est donné)"""
+        if noms is None:
+            fl = Flotte(self.robots, historique, integrateur=integrateur)
+        else:
+            par_nom = {r.nom: r for r in self.robots}
+            fl = Flotte([par_nom[n] for n in noms], historique, integrateur=integrateur)
+        fl.instruments = self.instruments
+        return fl
+
+    def simulFlotte(self, step, duree, commande, roues=True, noms=None, integrateur='euler'):
+        """Simule tous les robots ensemble : commande est un tableau (N,2) constant ou une fonction
+        commande(t, flotte) -> (N,2). Vitesses de roues (vg, vd) si roues, sinon (translation, rotation).
+        integrateur 'arc' ou 'rk4' : précision conservée avec des pas bien plus grands qu'en 'euler'."""
+        fl = self.flotte(noms, integrateur=integrateur)
+        pas = fl.pasRoues if roues else fl.pasVitesses
+        t = 0
+        while t < duree:
+            pas(step, self._commande(commande, t, fl))
+            t += step
+        with self._phase('historique'):
+            fl.ecrireHistoriques()
+        return fl
+
+    @Instruments.phaseInstrumentee('commande')
+    def _commande(self, commande, t, fl):
+        """commande du pas à l'instant t (tableau constant ou fonction commande(t, flotte))"""
+        return commande(t, fl) if callable(commande) else commande
 
     def followLeader(self, name):
         for r in self.robots:
@@ -149,79 +265,80 @@ class Simulateur(object):
             self.goToPos(r.nom, leader.pos[-1].x, leader.pos[-1].y)
 
 
-if __name__ == "__main__":  # false lors d'un import
-
-    def simulationControl(env):
-
-        from time import time
-        screen_size = 800
-
-        # Init pygame
-        pygame.init()
-        thisClock = pygClock()
-        screen = pygame.display.set_mode((screen_size, screen_size))
-
-        scale = 100
-        offset = np.array([300, 300]).astype(np.int_)
-
-        image = pygame.image.load("tortoise.jpg").convert()
-        image = pygame.transform.scale(image, (60, 45))
-        background = pygame.image.load("beach.png").convert()
-        # background = pygame.transform.scale(background, (800, 800))
-
-        tStart = time()
-        thisClock.tick()
+def simulationControl(env, sans_affichage=False, pas=0.01, duree=20.):
+    """Physique à pas fixe pas pendant duree, affichage pygame à 30 images/s au plus avec interpolation
+    des poses. sans_affichage : pas de fenêtre, la physique tourne aussi vite que possible.
+    Renvoie (nombre de pas de physique, nombre d'images affichées)."""
+    from time import time
+    screen_size = 800
 
+    seed(a=None, version=2)
+    for r in env.robots:
         seed(a=None, version=2)
-        for r in env.robots:
-            seed(a=None, version=2)
-            radius = randint(15, 50)
-            rot_speed = randint(1, 3)
-            const = randint(1,3)
-            x = randint(10, screen_size - 10)
-            y = randint(10, screen_size - 10)
-            env.goToPos(r.nom, x, y)
-            r.const = const
-            screen.blit(image, (int(r.pos[-1].x), int(r.pos[-1].y)))
-        t = 0.  # current time
-        env.goToPos('rob1', screen_size/2, screen_size/2)
-        while time() < tStart + 20.:  # Simulate twenty seconds
-            pygame.event.get()
-            screen.fill((255, 255, 255))  # Make screen white again -> otherwise all are displayed
-            screen.blit(background, (0, 0))
-            # Plot current
-
-            #aPend.drawPyGame(screen, (255, 255, 0))
-            #screen.blit(image, (int(rob2.pos[-1].x) , int(rob2.pos[-1].y) ))
-            vr = 1 * sin(1 * t)
-            vt = 60
-            dt = float(thisClock.tick(30)) / 1000.  # Let time pass, at least as much to have 30fps max
-            for r in env.robots:
-                #env.trajCirc(r.nom, radius*r.const, rot_speed, step=0.01, duree=1)
-                #env.goToPos(r.nom,radius*r.const,const*r.const*radius)
-                #env.controleur(r.nom, x_des=1+screen_size/2, y_des=1+screen_size/2,kvit=0.1,kangle=.1)
-                screen.blit(image, (int(r.pos[-1].x), int(r.pos[-1].y)))
-                r.simulMCI(dt, vt, vr)
-
-            #screen.blit(image, (int(rob1.pos[-1].x)+screen_size/2, int(rob1.pos[-1].y)+screen_size/2))
-            # for r in env.robots:
-            #     env.trajCirc(r.nom, radius, rot_speed, step=0.01, duree=1)
-
-
-
-            # Refresh
-            pygame.display.flip()
-
-            # vr = 1 * sin(1 * t)
-            # vt = 60
-            # env.simulMCI(dt, vt, vr)
-            # Update time
-            t += dt
-
-        pygame.display.quit()
-
-        return None
-
+        radius = randint(15, 50)
+        rot_speed = randint(1, 3)
+        const = randint(1,3)
+        x = randint(10, screen_size - 10)
+        y = randint(10, screen_size - 10)
+        env.goToPos(r.nom, x, y)
+        r.const = const
+    env.goToPos('rob1', screen_size/2, screen_size/2)
+
+    fl = env.flotte(historique=False)
+    # empreinte à l'échelle du sprite (60x45 pixels), arène de la taille de la fenêtre
+    fl.collisions = DetecteurCollisions(np.full(len(fl), 22.), bornes=(0, 0, screen_size, screen_size))
+    cmd = np.empty((len(fl), 2))
+
+    def avancer(t, dt):
+        cmd[:, 0] = 60              # vt
+        cmd[:, 1] = 1 * sin(1 * t)  # vr
+        fl.pasVitesses(dt, cmd)
+        #env.trajCirc(r.nom, radius*r.const, rot_speed, step=0.01, duree=1)
+        #env.controleur(r.nom, x_des=1+screen_size/2, y_des=1+screen_size/2,kvit=0.1,kangle=.1)
+
+    boucle = BouclePhysique(pas, avancer, lambda: np.stack((fl.x, fl.y, fl.theta)))
+
+    if sans_affichage:
+        boucle.executer(duree)
+        fl.ecrireHistoriques()
+        return boucle.nb_pas, 0
+
+    import pygame
+    from pygame.time import Clock as pygClock
+    # Init pygame
+    pygame.init()
+    thisClock = pygClock()
+    screen = pygame.display.set_mode((screen_size, screen_size))
+
+    image = pygame.image.load("tortoise.jpg").convert()
+    image = pygame.transform.scale(image, (60, 45))
+    background = pygame.image.load("beach.png").convert()
+    # background = pygame.transform.scale(background, (800, 800))
+    screen.fill((255, 255, 255))
+    screen.blit(background, (0, 0))
+    fond = screen.copy()    # fond blanc + plage, recopié sous les robots qui bougent
+
+    # sprites tournés construits une fois, puis seules les zones modifiées sont redessinées
+    rendu = RenduFlotte(screen, fond, AtlasSprites(image, nb_angles=72))
+
+    nb_images = 0
+    tStart = time()
+    thisClock.tick()
+    while time() < tStart + duree:
+        pygame.event.get()
+
+        dt = float(thisClock.tick(30)) / 1000.  # Let time pass, at least as much to have 30fps max
+        alpha = boucle.ecoulement(dt)
+        X, Y, Theta = boucle.interpole(alpha)
+        rendu.dessiner(X, Y, Theta)
+        nb_images += 1
+
+    pygame.display.quit()
+    fl.ecrireHistoriques()
+    return boucle.nb_pas, nb_images
+
+
+if __name__ == "__main__":  # false lors d'un import ; démo à lancer avec python -m <paquet>.environnement
     rob1 = Kobuki(nom='rob1', c='red')
     rob2 = Kobuki(nom='rob2', c='blue')
     rob3 = Kobuki(nom='rob3', c='green')
@@ -0,0 +1,157 @@
+import numpy as np
+from .integrateurs import schema
+
+
+def angleMod(a):
+    """angle ramené dans [-pi, pi)"""
+    return (np.asarray(a) + np.pi) % (2*np.pi) - np.pi
+
+
+class CibleAtteinte(object):
+    """Événement : robot à moins de tolerance de la cible (x_des, y_des), scalaires ou tableaux (N,)"""
+    nom = 'cible'
+
+    def __init__(self, x_des, y_des, tolerance=0.05):
+        self.x_des = x_des
+        self.y_des = y_des
+        self.tolerance = tolerance
+
+    def niveau(self, t, x, y, theta):
+        """fonction d'événement, négative ou nulle quand l'événement est atteint"""
+        return np.hypot(x - self.x_des, y - self.y_des) - self.tolerance
+
+
+class CapAligne(object):
+    """Événement : orientation à moins de tolerance (rad) du cap theta_des, scalaire ou tableau (N,)"""
+    nom = 'cap'
+
+    def __init__(self, theta_des, tolerance=0.01):
+        self.theta_des = theta_des
+        self.tolerance = tolerance
+
+    def niveau(self, t, x, y, theta):
+        return np.abs(angleMod(theta - self.theta_des)) - self.tolerance
+
+
+def loiRalliement(x_des, y_des, kvit=0.02, kangle=0.09):
+    """Loi de commande de Simulateur.controleur : vitesse proportionnelle à la distance à la cible,
+    rotation proportionnelle à l'écart entre l'orientation et la direction de la cible.
+    Renvoie commande(t, x, y, theta) -> (vit_trans, vit_rot) pour PiloteAdaptatif."""
+    def commande(t, x, y, theta):
+        vit_trans = kvit*np.hypot(x - x_des, y - y_des)
+        vit_rot = kangle*angleMod(np.arctan2(y_des - y, x_des - x) - theta)
+        return vit_trans, vit_rot
+    return commande
+
+
+class ResultatPilote(object):
+    """Bilan d'un PiloteAdaptatif.executer : pour chaque robot, l'événement qui l'a arrêté
+    (nom, ou 'delai') et son instant, interpolé dans le pas où il s'est produit"""
+
+    def __init__(self, evenements, temps, nb_pas, nb_rejets):
+        self.evenements = evenements
+        self.temps = temps
+        self.nb_pas = nb_pas        # pas acceptés, tous robots confondus
+        self.nb_rejets = nb_rejets  # pas refusés par le contrôle d'erreur
+
+    def __repr__(self):
+        noms, nb = np.unique(self.evenements, return_counts=True)
+        return ('ResultatPilote(' + ', '.join(str(c) + ' ' + n for n, c in zip(noms, nb))
+                + ', ' + str(self.nb_pas) + ' pas, ' + str(self.nb_rejets) + ' rejets)')
+
+
+class PiloteAdaptatif(object):
+    """Simulation d'une Flotte commandée en boucle fermée, à pas adaptatif et arrêt sur événements.
+    commande(t, x, y, theta) -> (vit_trans, vit_rot) est évaluée sur les tableaux (N,) de la flotte.
+    Chaque robot a son propre pas : un pas h est comparé à deux demi-pas (commande réévaluée à mi-pas) ;
+    l'écart, position plus angle ramené à la demi-voie, doit rester sous tolerance, sinon le pas est
+    refait plus court. Les deux demi-pas acceptés sont appliqués par Flotte.pasVitesses, restreint aux
+    robots dont le pas est accepté (historique, journal et collisions inchangés). Un robot s'arrête dès
+    qu'un de ses événements est atteint."""
+
+    def __init__(self, flotte, commande, evenements=(), tolerance=1e-3, pas_min=1e-4, pas_max=1., pas_initial=0.01):
+        self.flotte = flotte
+        self.commande = commande
+        self.evenements = list(evenements)
+        self.tolerance = tolerance
+        self.pas_min = pas_min
+        self.pas_max = pas_max
+        self.pas_initial = pas_initial
+
+    def _niveaux(self, t, x, y, theta):
+        n = len(self.flotte)
+        if not self.evenements:
+            return np.empty((0, n))
+        return np.array([np.broadcast_to(e.niveau(t, x, y, theta), (n,)) for e in self.evenements])
+
+    def _deuxDemiPas(self, t, x, y, theta, v, w, h):
+        """deux demi-pas de h/2, la commande étant réévaluée au milieu ; renvoie l'état final et la commande du milieu"""
+        incr = schema(self.flotte.integrateur)
+        dx, dy, dth = incr(theta, v, w, h/2)
+        xm, ym, thm = x + dx, y + dy, theta + dth
+        vm, wm = self.commande(t + h/2, xm, ym, thm)
+        vm, wm = np.broadcast_arrays(np.asarray(vm, dtype=float), np.asarray(wm, dtype=float))
+        dx, dy, dth = incr(thm, vm, wm, h/2)
+        return xm + dx, ym + dy, thm + dth, vm, wm
+
+    def executer(self, duree):
+        """Avance chaque robot jusqu'à son premier événement, ou jusqu'à t + duree ('delai')"""
+        fl = self.flotte
+        n = len(fl)
+        incr = schema(fl.integrateur)
+        fin = fl.t + duree
+        h = np.full(n, float(self.pas_initial))
+        evenements = np.full(n, 'delai', dtype=object)
+        temps = fin.copy()
+        niveaux = self._niveaux(fl.t, fl.x, fl.y, fl.theta)
+        actifs = np.ones(n, dtype=bool)
+        for k, e in enumerate(self.evenements):
+            deja = actifs & (niveaux[k] <= 0)
+            evenements[deja] = e.nom
+            temps[deja] = fl.t[deja]
+            actifs &= ~deja
+        longueur = fl.dist/2
+        nb_pas = nb_rejets = 0
+
+        while actifs.any():
+            t0, x0, y0, th0 = fl.t.copy(), fl.x.copy(), fl.y.copy(), fl.theta.copy()
+            h = np.clip(np.minimum(h, fin - t0), self.pas_min, self.pas_max)
+            h = np.minimum(h, fin - t0)
+            v, w = self.commande(t0, x0, y0, th0)
+            v, w = np.broadcast_arrays(np.asarray(v, dtype=float), np.asarray(w, dtype=float))
+
+            # un pas complet contre deux demi-pas : estimation de l'erreur locale
+            dx, dy, dth = incr(th0, v, w, h)
+            x2, y2, th2, vm, wm = self._deuxDemiPas(t0, x0, y0, th0, v, w, h)
+            erreur = np.hypot(x0 + dx - x2, y0 + dy - y2) + longueur*np.abs(th0 + dth - th2)
+            accepte = actifs & ((erreur <= self.tolerance) | (h <= self.pas_min))
+            rejete = actifs & ~accepte
+            nb_pas += int(accepte.sum())
+            nb_rejets += int(rejete.sum())
+
+            # erreur locale en h^2 (commande bloquée sur le pas) : facteur (tolerance/erreur)^(1/2)
+            with np.errstate(divide='ignore'):
+                facteur = 0.9*np.sqrt(self.tolerance/erreur)
+            facteur = np.clip(np.nan_to_num(facteur, posinf=5.), 0.2, 5.)
+
+            if accepte.any():
+                fl.pasVitesses(h/2, np.column_stack((v, w)), actifs=accepte)
+                fl.pasVitesses(h/2, np.column_stack((vm, wm)), actifs=accepte)
+
+                # événements : premier changement de signe, instant interpolé linéairement dans le pas
+                apres = self._niveaux(fl.t, fl.x, fl.y, fl.theta)
+                for k, e in enumerate(self.evenements):
+                    franchi = accepte & actifs & (apres[k] <= 0)
+                    if franchi.any():
+                        avant = niveaux[k][franchi]
+                        ecart = avant - apres[k][franchi]
+                        alpha = np.where(ecart > 0, avant/np.where(ecart > 0, ecart, 1.), 1.)
+                        temps[franchi] = t0[franchi] + np.clip(alpha, 0., 1.)*h[franchi]
+                        evenements[franchi] = e.nom
+                        actifs &= ~franchi
+                niveaux = np.where(accepte, apres, niveaux)
+                echus = actifs & (fl.t >= fin - 1e-12)
+                actifs &= ~echus
+            h = h*facteur
+
+        return ResultatPilote(evenements, temps, nb_pas, nb_rejets)
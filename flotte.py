@@ -0,0 +1,232 @@
+import numpy as np
+from .historique import compterAllocation
+from .instrumentation import Instruments, AttributInstruments
+from .banque_moteurs import BanqueMoteurs
+from .integrateurs import schema
+
+
+class Flotte(object):
+    """Flotte de N robots en structure de tableaux (x, y, theta, rayon des roues, entraxe).
+    Chaque pas de temps fait avancer tous les robots en une seule opération NumPy.
+    integrateur : schéma d'intégration de la pose ('euler', 'point_milieu', 'rk4', 'arc')."""
+
+    instruments = AttributInstruments()
+
+    def __init__(self, robots=(), historique=True, capacite=1024, integrateur='euler'):
+        self.robots = list(robots)
+        self.noms = [r.nom for r in self.robots]
+        self.index = {nom: i for i, nom in enumerate(self.noms)}   # nom -> indice dans les tableaux
+
+        n = len(self.robots)
+        self.x = np.empty(n)
+        self.y = np.empty(n)
+        self.theta = np.empty(n)
+        self.t = np.empty(n)
+        for i, r in enumerate(self.robots):
+            self.x[i], self.y[i], self.theta[i], self.t[i] = r.historique.derniere()
+        self.r = np.array([r.r for r in self.robots], dtype=float)
+        self.dist = np.array([r.dist for r in self.robots], dtype=float)
+
+        self._v = np.empty(n)   # tampons de travail réutilisés à chaque pas
+        self._w = np.empty(n)
+        self._tmp = np.empty(n)
+
+        self.banque = None      # moteurs des roues : gauches en [0, N), droits en [N, 2N)
+        self.reduction = None
+        self.journal = None     # EnregistreurJournal éventuel, alimenté à chaque pas
+        self.collisions = None  # DetecteurCollisions éventuel, appliqué après chaque pas
+        self.contacts = None    # contacts du dernier pas
+        self.integrateur = integrateur
+        self.instruments = None
+
+        # poses enregistrées depuis le dernier ecrireHistoriques, une ligne par pas ;
+        # _hactifs marque les robots avancés à chaque pas (tous, sauf pas restreint par actifs)
+        self.historique = historique
+        self._nb = 0
+        self._partiel = False   # au moins un pas restreint depuis le dernier ecrireHistoriques
+        if historique:
+            self._hx = np.empty((capacite, n))
+            self._hy = np.empty((capacite, n))
+            self._htheta = np.empty((capacite, n))
+            self._ht = np.empty((capacite, n))
+            self._hactifs = np.empty((capacite, n), dtype=bool)
+
+    def __len__(self):
+        return len(self.robots)
+
+    def __repr__(self):
+        return 'Flotte(' + str(len(self.robots)) + ' robots)'
+
+    def mcd(self, cmd):
+        """Modèle cinématique direct de toute la flotte : cmd (N,2) de vitesses de roues (vg, vd),
+        renvoie (N,2) de vitesses (translation, rotation)"""
+        cmd = np.asarray(cmd, dtype=float)
+        vit = np.empty_like(cmd)
+        vit[:, 0] = self.r/2*(cmd[:, 0]+cmd[:, 1])
+        vit[:, 1] = self.r/self.dist*(cmd[:, 1]-cmd[:, 0])
+        return vit
+
+    def pasRoues(self, dt, cmd, actifs=None):
+        """Avance tous les robots d'un pas dt avec les vitesses de roues cmd (N,2) = (vg, vd) ;
+        actifs comme pour pasVitesses"""
+        cmd = np.asarray(cmd, dtype=float)
+        v, w = self._v, self._w
+        np.add(cmd[:, 0], cmd[:, 1], out=v)
+        v *= self.r
+        v *= 0.5
+        np.subtract(cmd[:, 1], cmd[:, 0], out=w)
+        w *= self.r
+        w /= self.dist
+        self._integrer(dt, v, w, actifs)
+
+    def pasVitesses(self, dt, cmd, actifs=None):
+        """Avance tous les robots d'un pas dt avec les vitesses cmd (N,2) = (translation, rotation).
+        actifs : masque (N,) des seuls robots à avancer (les autres ne bougent pas et n'ajoutent
+        pas de pose à leur historique) ; dt peut aussi être un tableau (N,), un pas par robot"""
+        cmd = np.asarray(cmd, dtype=float)
+        self._integrer(dt, cmd[:, 0], cmd[:, 1], actifs)
+
+    def equiperMoteurs(self, banque=None):
+        """Chaîne de traction de toute la flotte : une BanqueMoteurs de 2N moteurs (gauches puis droits).
+        Par défaut, elle reprend les moteurs des Kobuki équipés (equiperMoteurs) ou des moteurs par défaut.
+        La banque enregistre ses états si la flotte enregistre ses poses et partage ses instruments."""
+        n = len(self.robots)
+        if banque is None:
+            if all(r.moteurs is not None for r in self.robots):
+                banque = BanqueMoteurs([r.moteurs[0] for r in self.robots] + [r.moteurs[1] for r in self.robots],
+                                       historique=self.historique)
+            else:
+                banque = BanqueMoteurs.depuisParametres(2*n, historique=self.historique)
+        if self.instruments is not None:
+            banque.instruments = self.instruments
+        self.banque = banque
+        self.reduction = np.array([r.reduction for r in self.robots], dtype=float)
+
+    def pasTensions(self, dt, tensions, sous_pas=1):
+        """Avance tous les robots d'un pas dt commandés en tensions (N,2) = (ug, ud) : la banque de moteurs
+        est intégrée sur sous_pas sous-pas, puis la vitesse moyenne des roues alimente pasRoues"""
+        tensions = np.asarray(tensions, dtype=float)
+        u = np.concatenate((tensions[:, 0], tensions[:, 1]))
+        h = dt/sous_pas
+        somme = np.zeros(u.shape[0])
+        for _ in range(sous_pas):
+            self.banque.pas(h, u)
+            somme += self.banque.vitesse
+        somme /= sous_pas
+        n = len(self.robots)
+        cmd = np.empty((n, 2))
+        cmd[:, 0] = somme[:n]/self.reduction
+        cmd[:, 1] = somme[n:]/self.reduction
+        self.pasRoues(dt, cmd)
+
+    def etat(self, historique=False):
+        """copie des tableaux d'état de la flotte (et de sa banque de moteurs) ;
+        les historiques restent dans les Kobuki, historique est ignoré"""
+        return {'x': self.x.copy(), 'y': self.y.copy(), 'theta': self.theta.copy(), 't': self.t.copy(),
+                'r': self.r.copy(), 'dist': self.dist.copy(),
+                'banque': None if self.banque is None else self.banque.etat(historique)}
+
+    def restaurerEtat(self, etat):
+        """les poses enregistrées et non encore écrites dans les historiques sont abandonnées ;
+        la banque de moteurs est créée ou retirée pour correspondre à l'instantané"""
+        for nom in ('x', 'y', 'theta', 't', 'r', 'dist'):
+            getattr(self, nom)[:] = etat[nom]
+        if etat['banque'] is None:
+            self.banque = None
+        else:
+            if self.banque is None:
+                self.equiperMoteurs()
+            self.banque.restaurerEtat(etat['banque'])
+        self._nb = 0
+        self._partiel = False
+
+    @Instruments.pasInstrumente('robots_avances', nombre=len)
+    def _integrer(self, dt, v, w, actifs=None):
+        """Mêmes schémas que Kobuki.simulMCI ; Euler (orientation mise à jour avant la position) sur place"""
+        ins = self.instruments
+        if self.collisions is not None:
+            x_prec, y_prec = self.x.copy(), self.y.copy()
+        if actifs is not None:
+            idx = np.flatnonzero(actifs)
+            if ins is not None:
+                ins.elements = len(idx)
+            dt_i = dt[idx] if np.ndim(dt) else dt
+            dx, dy, dtheta = schema(self.integrateur)(self.theta[idx], v[idx], w[idx], dt_i)
+            self.x[idx] += dx
+            self.y[idx] += dy
+            self.theta[idx] += dtheta
+            self.t[idx] += dt_i
+        elif self.integrateur == 'euler':
+            tmp = self._tmp
+            np.multiply(w, dt, out=tmp)
+            self.theta += tmp
+            np.cos(self.theta, out=tmp)
+            tmp *= v
+            tmp *= dt
+            self.x += tmp
+            np.sin(self.theta, out=tmp)
+            tmp *= v
+            tmp *= dt
+            self.y += tmp
+        else:
+            dx, dy, dtheta = schema(self.integrateur)(self.theta, v, w, dt)
+            self.x += dx
+            self.y += dy
+            self.theta += dtheta
+        if actifs is None:
+            self.t += dt
+        if ins is not None:
+            ins.etape('cinematique')
+        if self.collisions is not None:
+            self.contacts = self.collisions.appliquer(self, x_prec, y_prec, actifs)
+            if ins is not None:
+                ins.etape('collisions')
+        if self.historique:
+            self._enregistrer(actifs)
+            if ins is not None:
+                ins.etape('historique')
+        if self.journal is not None:
+            self.journal.enregistrerFlotte(self)
+            if ins is not None:
+                ins.etape('journal')
+
+    def _enregistrer(self, actifs=None):
+        i = self._nb
+        if i == self._hx.shape[0]:
+            octets = 0
+            for nom in ('_hx', '_hy', '_htheta', '_ht', '_hactifs'):
+                ancien = getattr(self, nom)
+                nouveau = np.empty((2*ancien.shape[0], ancien.shape[1]), dtype=ancien.dtype)
+                nouveau[:i] = ancien
+                setattr(self, nom, nouveau)
+                octets += nouveau.nbytes
+            compterAllocation(octets)
+        self._hx[i] = self.x
+        self._hy[i] = self.y
+        self._htheta[i] = self.theta
+        self._ht[i] = self.t
+        if actifs is None:
+            self._hactifs[i] = True
+        else:
+            self._hactifs[i] = actifs
+            self._partiel = True
+        self._nb = i + 1
+
+    def ecrireHistoriques(self):
+        """Recopie les poses calculées dans l'historique de chaque Kobuki (un bloc par robot).
+        Sans historique, seule la pose courante est ajoutée. Les états de la banque de moteurs
+        éventuelle sont de même recopiés dans les MoteurCC des robots."""
+        k = self._nb
+        for i, rob in enumerate(self.robots):
+            if self.historique:
+                if k:
+                    # après des pas restreints, seules les lignes où le robot a avancé sont recopiées
+                    lignes = np.flatnonzero(self._hactifs[:k, i]) if self._partiel else slice(None, k)
+                    rob.historique.ajouterBloc(self._hx[lignes, i], self._hy[lignes, i], self._htheta[lignes, i],
+                                               self._ht[lignes, i])
+            elif rob.historique.t[-1] != self.t[i]:
+                rob.historique.ajouter(self.x[i], self.y[i], self.theta[i], self.t[i])
+        self._nb = 0
+        self._partiel = False
+        if self.banque is not None:
+            self.banque.ecrireHistoriques()
@@ -0,0 +1,43 @@
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+
+
+def decimerMinMax(x, y, nb_paquets=1000):
+    """Indices à conserver pour tracer la courbe (x, y) avec environ 4*nb_paquets points sans en
+    changer l'allure : les points sont regroupés par paquets consécutifs et, pour chaque paquet, on
+    garde le premier point et ceux où x et y sont extrêmes. Entièrement vectorisé."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = x.shape[0]
+    if n <= 4*nb_paquets:
+        return np.arange(n)
+    taille = -(-n // nb_paquets)
+    nb = -(-n // taille)
+    complet = nb*taille
+    # le dernier paquet est complété en répétant le dernier point
+    idx = np.minimum(np.arange(complet), n - 1).reshape(nb, taille)
+    px, py = x[idx], y[idx]
+    lignes = np.arange(nb)
+    garde = np.concatenate((idx[:, 0],
+                            idx[lignes, np.argmin(px, axis=1)], idx[lignes, np.argmax(px, axis=1)],
+                            idx[lignes, np.argmin(py, axis=1)], idx[lignes, np.argmax(py, axis=1)],
+                            (n - 1,)))
+    return np.unique(garde)
+
+
+def tracerTrajectoires(ax, robots, nb_paquets=1000, **options):
+    """Trace les trajectoires de tous les robots en une seule LineCollection à partir des
+    historiques (sans copie en listes), chacune décimée par decimerMinMax. Renvoie la collection."""
+    robots = list(robots)
+    segments = []
+    for r in robots:
+        h = r.historique
+        garde = decimerMinMax(h.x, h.y, nb_paquets)
+        segments.append(np.column_stack((h.x[garde], h.y[garde])))
+    collection = LineCollection(segments, colors=[r.color for r in robots], **options)
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    # légende par des tracés fictifs, une entrée par robot
+    ax.legend(handles=[Line2D([], [], color=r.color, label=r.nom) for r in robots])
+    return collection
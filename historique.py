@@ -0,0 +1,205 @@
+import numpy as np
+from .classes_meca import Vecteur3d
+
+# réallocations des historiques (nombre, octets alloués), tous objets confondus ; lu par instrumentation
+ALLOCATIONS = {'nb': 0, 'octets': 0}
+
+
+def compterAllocation(octets):
+    ALLOCATIONS['nb'] += 1
+    ALLOCATIONS['octets'] += octets
+
+
+class HistoriquePose(object):
+    """Historique des poses d'un robot : colonnes x, y, theta et t contiguës en float64.
+    La capacité double quand elle est atteinte (croissance amortie)."""
+
+    def __init__(self, x=0., y=0., theta=0., t=0., capacite=1024):
+        capacite = max(int(capacite), 1)
+        self._x = np.empty(capacite)
+        self._y = np.empty(capacite)
+        self._theta = np.empty(capacite)
+        self._t = np.empty(capacite)
+        self.n = 0
+        self.ajouter(x, y, theta, t)
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return 'HistoriquePose(n=' + str(self.n) + ', capacite=' + str(self._x.shape[0]) + ')'
+
+    def _agrandir(self, n_min):
+        """réalloue les colonnes avec une capacité au moins égale à n_min"""
+        capacite = self._x.shape[0]
+        while capacite < n_min:
+            capacite *= 2
+        for nom in ('_x', '_y', '_theta', '_t'):
+            ancien = getattr(self, nom)
+            nouveau = np.empty(capacite)
+            nouveau[:self.n] = ancien[:self.n]
+            setattr(self, nom, nouveau)
+        compterAllocation(4*nouveau.nbytes)
+
+    def reserver(self, n_sup):
+        """prévoit la place pour n_sup poses supplémentaires"""
+        if self.n + n_sup > self._x.shape[0]:
+            self._agrandir(self.n + n_sup)
+
+    def ajouter(self, x, y, theta, t):
+        """ajout d'une pose à la fin de l'historique"""
+        if self.n == self._x.shape[0]:
+            self._agrandir(self.n + 1)
+        i = self.n
+        self._x[i] = x
+        self._y[i] = y
+        self._theta[i] = theta
+        self._t[i] = t
+        self.n = i + 1
+
+    def ajouterBloc(self, x, y, theta, t):
+        """ajout d'un bloc de poses (tableaux de même longueur) en une seule copie"""
+        k = len(x)
+        self.reserver(k)
+        i = self.n
+        self._x[i:i+k] = x
+        self._y[i:i+k] = y
+        self._theta[i:i+k] = theta
+        self._t[i:i+k] = t
+        self.n = i + k
+
+    # Vues sans copie sur la partie remplie (invalidées par un agrandissement)
+    @property
+    def x(self):
+        return self._x[:self.n]
+
+    @property
+    def y(self):
+        return self._y[:self.n]
+
+    @property
+    def theta(self):
+        return self._theta[:self.n]
+
+    @property
+    def t(self):
+        return self._t[:self.n]
+
+    def derniere(self):
+        """dernière pose sous la forme (x, y, theta, t)"""
+        i = self.n - 1
+        return self._x[i], self._y[i], self._theta[i], self._t[i]
+
+    def etat(self, historique=False):
+        """copie des colonnes (toutes les poses si historique, sinon seulement la dernière)"""
+        debut = 0 if historique else self.n - 1
+        return {'x': self._x[debut:self.n].copy(), 'y': self._y[debut:self.n].copy(),
+                'theta': self._theta[debut:self.n].copy(), 't': self._t[debut:self.n].copy()}
+
+    def restaurerEtat(self, etat):
+        """remplace le contenu de l'historique par celui d'un etat()"""
+        self.n = 0
+        self.ajouterBloc(etat['x'], etat['y'], etat['theta'], etat['t'])
+
+
+class VuePositions(object):
+    """Vue séquence de l'historique se comportant comme l'ancienne liste de Vecteur3d :
+    pos[-1], pos[i], len(pos), for p in pos"""
+
+    def __init__(self, historique):
+        self.historique = historique
+
+    def __len__(self):
+        return self.historique.n
+
+    def __getitem__(self, i):
+        h = self.historique
+        if isinstance(i, slice):
+            return [Vecteur3d(float(x), float(y)) for x, y in zip(h.x[i], h.y[i])]
+        if i < 0:
+            i += h.n
+        if not 0 <= i < h.n:
+            raise IndexError('indice de position hors historique')
+        return Vecteur3d(float(h._x[i]), float(h._y[i]))
+
+    def __iter__(self):
+        h = self.historique
+        for x, y in zip(h.x.tolist(), h.y.tolist()):
+            yield Vecteur3d(x, y)
+
+
+class VueOrientations(object):
+    """Vue séquence des orientations : ori[-1], ori[i], len(ori), for o in ori"""
+
+    def __init__(self, historique):
+        self.historique = historique
+
+    def __len__(self):
+        return self.historique.n
+
+    def __getitem__(self, i):
+        h = self.historique
+        if isinstance(i, slice):
+            return h.theta[i].tolist()
+        if i < 0:
+            i += h.n
+        if not 0 <= i < h.n:
+            raise IndexError("indice d'orientation hors historique")
+        return float(h._theta[i])
+
+    def __iter__(self):
+        return iter(self.historique.theta.tolist())
+
+
+class Tampon(object):
+    """Historique d'une grandeur scalaire : tableau float64 préalloué avec curseur,
+    capacité doublée si besoin. valeurs est une vue sans copie sur la partie remplie."""
+
+    def __init__(self, valeurs=(), capacite=1024):
+        valeurs = np.asarray(valeurs, dtype=float).ravel()
+        self._v = np.empty(max(int(capacite), len(valeurs), 1))
+        self._v[:len(valeurs)] = valeurs
+        self.n = len(valeurs)
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return 'Tampon(n=' + str(self.n) + ', capacite=' + str(self._v.shape[0]) + ')'
+
+    def reserver(self, n_sup):
+        """prévoit la place pour n_sup valeurs supplémentaires"""
+        capacite = self._v.shape[0]
+        if self.n + n_sup > capacite:
+            while capacite < self.n + n_sup:
+                capacite *= 2
+            nouveau = np.empty(capacite)
+            nouveau[:self.n] = self._v[:self.n]
+            self._v = nouveau
+            compterAllocation(nouveau.nbytes)
+
+    def ajouter(self, valeur):
+        if self.n == self._v.shape[0]:
+            self.reserver(1)
+        self._v[self.n] = valeur
+        self.n += 1
+
+    def ajouterBloc(self, valeurs):
+        k = len(valeurs)
+        self.reserver(k)
+        self._v[self.n:self.n+k] = valeurs
+        self.n += k
+
+    def dernier(self):
+        return self._v[self.n-1]
+
+    @property
+    def valeurs(self):
+        return self._v[:self.n]
+
+    def etat(self, historique=False):
+        return self._v[0 if historique else self.n-1:self.n].copy()
+
+    def restaurerEtat(self, etat):
+        self.n = 0
+        self.ajouterBloc(etat)
@@ -0,0 +1,33 @@
+import pickle
+import random
+import numpy as np
+
+
+def capturer(*objets, historique=False):
+    """Instantané de l'état de simulateurs (Simulateur, SimuMotCC), flottes, banques de moteurs,
+    robots, moteurs ou correcteurs, ainsi que des générateurs aléatoires (random et numpy.random).
+    Toutes les données sont copiées : l'instantané ne change plus quand la simulation continue.
+    historique=False : seul l'état courant est gardé, sans les historiques (instantané compact)."""
+    return {'etats': [o.etat(historique) for o in objets], 'random': random.getstate(), 'numpy': np.random.get_state()}
+
+
+def restaurer(instantane, *objets):
+    """Remet les objets (dans le même ordre qu'à la capture) et les générateurs aléatoires dans
+    l'état de l'instantané. Sans historique capturé, l'historique repart de la pose de l'instantané."""
+    if len(objets) != len(instantane['etats']):
+        raise ValueError("l'instantané contient " + str(len(instantane['etats'])) + ' objets')
+    for o, e in zip(objets, instantane['etats']):
+        o.restaurerEtat(e)
+    random.setstate(instantane['random'])
+    np.random.set_state(instantane['numpy'])
+
+
+def sauver(chemin, instantane):
+    """écrit un instantané sur disque (pickle binaire, tableaux NumPy sans conversion)"""
+    with open(chemin, 'wb') as f:
+        pickle.dump(instantane, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def charger(chemin):
+    with open(chemin, 'rb') as f:
+        return pickle.load(f)
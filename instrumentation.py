@@ -0,0 +1,180 @@
+import os
+import json
+from time import perf_counter
+from contextlib import contextmanager
+from collections import defaultdict
+from functools import wraps
+from . import historique
+
+
+class Instruments(object):
+    """Instrumentation des boucles de simulation : durée cumulée et nombre d'appels par phase
+    (cinematique, collisions, historique, journal, moteurs, correcteur, commande, trace, rendu...),
+    compteurs (pas, robots et moteurs avancés, réallocations d'historique), crochets appelés avant
+    et après chaque pas, et trace facultative au format Chrome (chrome://tracing, Perfetto).
+
+    S'active en affectant l'objet à l'attribut instruments d'un Kobuki, d'une Flotte, d'un MoteurCC,
+    d'une BanqueMoteurs, ou via Simulateur.instrumenter / SimuMotCC.instrumenter.
+    trace : enregistre les phases d'un pas sur echantillonnage dans la trace.
+    Les méthodes de pas sont décorées par Instruments.pasInstrumente, les calculs hors pas
+    (correcteurs, commande) par Instruments.phaseInstrumentee ; leurs versions instrumentées ne sont
+    installées sur un objet que lorsqu'on lui affecte des instruments (voir AttributInstruments) :
+    désactivée (instruments = None), l'instrumentation ne coûte rien."""
+
+    def __init__(self, trace=False, echantillonnage=1):
+        self.trace = trace
+        self.echantillonnage = max(int(echantillonnage), 1)
+        self.avant = []     # crochets f(objet) appelés avant chaque pas
+        self.apres = []     # crochets f(objet) appelés après chaque pas
+        self.elements = 1   # éléments avancés par le pas en cours (modifiable par la méthode de pas)
+        self._jalon = None  # fin de la dernière phase close du pas en cours
+        self.reinitialiser()
+
+    @staticmethod
+    def pasInstrumente(compteur, phase=None, nombre=None, bloc=False):
+        """Décorateur d'une méthode de pas : sa version instrumentée appelle les crochets avant et après
+        le pas, augmente compteur de nombre(objet) éléments (1 par défaut) et, si phase est donnée,
+        compte la durée du pas dans phase. Une méthode à plusieurs phases les clôt elle-même par
+        instruments.etape(phase) et peut fixer instruments.elements. bloc : la méthode avance
+        instruments.elements pas d'un coup (compteur pas augmenté d'autant)."""
+        def decorer(methode):
+            @wraps(methode)
+            def pas(objet, *args, **kwargs):
+                ins = objet.instruments
+                jalon, elements = ins._jalon, ins.elements     # pas englobant éventuel
+                ins.avantPas(objet)
+                ins.elements = 1 if nombre is None else nombre(objet)
+                ins._jalon = perf_counter()
+                try:
+                    resultat = methode(objet, *args, **kwargs)
+                    if phase is not None:
+                        ins.etape(phase)
+                    ins.apresPas(objet, compteur, ins.elements, ins.elements if bloc else 1)
+                finally:
+                    ins._jalon, ins.elements = jalon, elements
+                return resultat
+            methode.instrumentee = pas
+            return methode
+        return decorer
+
+    @staticmethod
+    def phaseInstrumentee(phase):
+        """Décorateur d'une méthode hors pas (correcteur, commande...) : sa version instrumentée compte
+        sa durée dans phase"""
+        def decorer(methode):
+            @wraps(methode)
+            def chronometree(objet, *args, **kwargs):
+                debut = perf_counter()
+                resultat = methode(objet, *args, **kwargs)
+                objet.instruments.fin(phase, debut)
+                return resultat
+            methode.instrumentee = chronometree
+            return methode
+        return decorer
+
+    def reinitialiser(self):
+        self.durees = defaultdict(float)
+        self.appels = defaultdict(int)
+        self.compteurs = defaultdict(int)
+        self.evenements = []    # (phase, début, fin) des phases échantillonnées
+        self._echantillon = self.trace
+        self._origine = perf_counter()
+        self._allocations = dict(historique.ALLOCATIONS)
+
+    def fin(self, phase, debut, trace=None):
+        """clôt la phase commencée à debut (perf_counter) ; renvoie l'instant de fin pour enchaîner"""
+        maintenant = perf_counter()
+        self.durees[phase] += maintenant - debut
+        self.appels[phase] += 1
+        if self._echantillon if trace is None else trace:
+            self.evenements.append((phase, debut, maintenant))
+        return maintenant
+
+    def etape(self, phase):
+        """clôt phase dans une méthode décorée par pasInstrumente : durée depuis la phase précédente du pas"""
+        self._jalon = self.fin(phase, self._jalon)
+
+    @contextmanager
+    def phase(self, nom):
+        """with instruments.phase('rendu'): ... pour les phases hors pas de simulation (toujours tracées)"""
+        debut = perf_counter()
+        try:
+            yield
+        finally:
+            self.fin(nom, debut, self.trace)
+
+    def compter(self, nom, n=1):
+        self.compteurs[nom] += n
+
+    def avantPas(self, objet):
+        if self.trace:
+            self._echantillon = self.compteurs['pas'] % self.echantillonnage == 0
+        for crochet in self.avant:
+            crochet(objet)
+
+    def apresPas(self, objet, compteur, n=1, pas=1):
+        """fin d'un pas (ou d'un bloc de pas) ayant avancé n éléments (robots ou moteurs, selon compteur)"""
+        self.compteurs['pas'] += pas
+        self.compteurs[compteur] += n
+        for crochet in self.apres:
+            crochet(objet)
+
+    def allocations(self):
+        """réallocations d'historique (nombre, octets) depuis la création ou la réinitialisation"""
+        return {nom: historique.ALLOCATIONS[nom] - self._allocations[nom] for nom in self._allocations}
+
+    def resume(self):
+        total = perf_counter() - self._origine
+        return {'duree_totale': total,
+                'phases': {nom: {'duree': d, 'appels': self.appels[nom]} for nom, d in self.durees.items()},
+                'compteurs': dict(self.compteurs),
+                'allocations_historique': self.allocations()}
+
+    def rapport(self):
+        """tableau texte des phases triées par durée, puis des compteurs"""
+        resume = self.resume()
+        lignes = ['%-20s %10s %10s %12s' % ('phase', 'duree (s)', 'part', 'appels')]
+        for nom, p in sorted(resume['phases'].items(), key=lambda e: -e[1]['duree']):
+            lignes.append('%-20s %10.4f %9.1f%% %12d' % (nom, p['duree'], 100*p['duree']/resume['duree_totale'],
+                                                         p['appels']))
+        for nom, n in sorted(resume['compteurs'].items()):
+            lignes.append('%-20s %10d' % (nom, n))
+        alloc = resume['allocations_historique']
+        lignes.append('%-20s %10d (%.1f Mo)' % ('reallocations', alloc['nb'], alloc['octets']/2**20))
+        return '\n'.join(lignes)
+
+    def ecrireTrace(self, chemin):
+        """Écrit la trace au format Chrome (JSON « traceEvents ») : une tranche par phase échantillonnée,
+        puis les compteurs et le résumé en métadonnées"""
+        pid = os.getpid()
+        us = lambda s: (s - self._origine)*1e6
+        evenements = [{'name': phase, 'ph': 'X', 'ts': us(debut), 'dur': (fin - debut)*1e6, 'pid': pid, 'tid': 0}
+                      for phase, debut, fin in self.evenements]
+        evenements.append({'name': 'compteurs', 'ph': 'C', 'ts': us(perf_counter()), 'pid': pid,
+                           'args': dict(self.compteurs)})
+        with open(chemin, 'w') as f:
+            json.dump({'traceEvents': evenements, 'displayTimeUnit': 'ms', 'otherData': self.resume()}, f)
+
+
+class AttributInstruments(object):
+    """Attribut de classe instruments des objets instrumentables (instruments = AttributInstruments()).
+    L'affectation d'Instruments installe sur l'objet les versions instrumentées des méthodes décorées
+    par Instruments.pasInstrumente et Instruments.phaseInstrumentee, celle de None les retire.
+    Sans __get__, la lecture de objet.instruments reste celle d'un attribut ordinaire."""
+
+    def __init__(self):
+        self._methodes = {}     # classe -> noms des méthodes décorées
+
+    def methodes(self, classe):
+        if classe not in self._methodes:
+            self._methodes[classe] = [nom for nom in dir(classe)
+                                      if hasattr(getattr(classe, nom, None), 'instrumentee')]
+        return self._methodes[classe]
+
+    def __set__(self, objet, instruments):
+        objet.__dict__['instruments'] = instruments
+        for nom in self.methodes(type(objet)):
+            if instruments is None:
+                objet.__dict__.pop(nom, None)
+            else:
+                objet.__dict__[nom] = getattr(type(objet), nom).instrumentee.__get__(objet)
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Intégration de la cinématique d'unicycle  x' = v cos(theta), y' = v sin(theta), theta' = w
+# avec des vitesses (v, w) constantes sur chaque pas dt (commande bloquée, comme pour les moteurs).
+# Chaque schéma renvoie l'incrément de pose (dx, dy, dtheta) ; il ne dépend que de l'orientation
+# de début de pas theta et de dtheta = w*dt, donc s'applique aussi bien à un robot qu'à des
+# tableaux (N,) de robots ou à une suite de pas (sommes cumulées, voir integrerBloc).
+#   'euler'        : schéma historique de simulMCD, orientation mise à jour avant la position
+#   'point_milieu' : direction prise à mi-pas, erreur en dt^3 par pas
+#   'rk4'          : Runge-Kutta d'ordre 4 (pondération de Simpson des directions)
+#   'arc'          : intégration exacte de l'arc de cercle parcouru pendant le pas
+
+
+def _euler(theta, v, w, dt):
+    dtheta = w*dt
+    theta1 = theta + dtheta
+    d = v*dt
+    return d*np.cos(theta1), d*np.sin(theta1), dtheta
+
+
+def _pointMilieu(theta, v, w, dt):
+    dtheta = w*dt
+    milieu = theta + 0.5*dtheta
+    d = v*dt
+    return d*np.cos(milieu), d*np.sin(milieu), dtheta
+
+
+def _rk4(theta, v, w, dt):
+    dtheta = w*dt
+    milieu = theta + 0.5*dtheta
+    fin = theta + dtheta
+    d = v*dt/6
+    return (d*(np.cos(theta) + 4*np.cos(milieu) + np.cos(fin)),
+            d*(np.sin(theta) + 4*np.sin(milieu) + np.sin(fin)), dtheta)
+
+
+def _arc(theta, v, w, dt):
+    # corde de l'arc : v/w*(sin(theta+dtheta) - sin(theta)) = v*dt*sinc(dtheta/2)*cos(theta + dtheta/2),
+    # forme sans division qui reste exacte en ligne droite (w = 0)
+    dtheta = w*dt
+    milieu = theta + 0.5*dtheta
+    d = v*dt*np.sinc(dtheta/(2*np.pi))
+    return d*np.cos(milieu), d*np.sin(milieu), dtheta
+
+
+INTEGRATEURS = {'euler': _euler, 'point_milieu': _pointMilieu, 'rk4': _rk4, 'arc': _arc}
+
+
+def schema(nom):
+    """fonction d'incrément (theta, v, w, dt) -> (dx, dy, dtheta) du schéma nom"""
+    try:
+        return INTEGRATEURS[nom]
+    except KeyError:
+        raise ValueError('integrateur inconnu : ' + str(nom))
+
+
+def integrerBloc(nom, x, y, theta, dt, v, w):
+    """Intègre une suite de commandes (v, w), une par pas dt, depuis la pose (x, y, theta) ;
+    renvoie les poses xs, ys, thetas après chaque pas. Les orientations sont obtenues par somme
+    cumulée, d'où les orientations de début de pas, puis les incréments de position de tous les
+    pas en une opération et leur somme cumulée."""
+    v, w = np.broadcast_arrays(np.asarray(v, dtype=float), np.asarray(w, dtype=float))
+    thetas = theta + np.cumsum(w*dt)
+    debuts = np.concatenate(((theta,), thetas[:-1]))
+    dx, dy, _ = schema(nom)(debuts, v, w, dt)
+    return x + np.cumsum(dx), y + np.cumsum(dy), thetas
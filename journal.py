@@ -0,0 +1,160 @@
+import os
+import json
+import numpy as np
+
+INDEX = 'index.json'
+
+
+class EnregistreurJournal(object):
+    """Enregistrement sur disque, pendant la simulation, de canaux nommés (poses, état des moteurs...)
+    par blocs binaires de taille fixe : un fichier .npy par bloc et par canal, décrits par index.json.
+    La mémoire utilisée est bornée par taille_bloc lignes par canal, quelle que soit la durée.
+    Les canaux sont fixés par la première ligne et chaque ligne doit les fournir tous : un journal
+    n'a qu'une source (une Flotte ou une BanqueMoteurs, chacune avec son propre journal)."""
+
+    def __init__(self, dossier, taille_bloc=4096):
+        os.makedirs(dossier, exist_ok=True)
+        self.dossier = dossier
+        self.taille_bloc = taille_bloc
+        self.nb_lignes = 0
+        self._tampons = {}      # canal -> tableau (taille_bloc, *forme)
+        self._segments = {}     # canal -> [(fichier, nb_lignes), ...]
+        self._n = 0             # lignes dans les tampons
+
+    def ajouter(self, **canaux):
+        """ajoute une ligne à chaque canal (scalaire ou tableau de forme fixe, par ex. x=(N,))"""
+        if not self._tampons:
+            for nom, valeur in canaux.items():
+                valeur = np.asarray(valeur)
+                self._tampons[nom] = np.empty((self.taille_bloc,) + valeur.shape,
+                                              dtype=np.result_type(valeur.dtype, np.float64))
+                self._segments[nom] = []
+        elif canaux.keys() != self._tampons.keys():
+            manquants = sorted(set(self._tampons) - set(canaux))
+            inconnus = sorted(set(canaux) - set(self._tampons))
+            raise ValueError('canaux du journal : ' + ', '.join(sorted(self._tampons))
+                             + (' ; manquants : ' + ', '.join(manquants) if manquants else '')
+                             + (' ; inconnus : ' + ', '.join(inconnus) if inconnus else '')
+                             + ' (un journal par source)')
+        i = self._n
+        for nom, valeur in canaux.items():
+            self._tampons[nom][i] = valeur
+        self._n = i + 1
+        self.nb_lignes += 1
+        if self._n == self.taille_bloc:
+            self._vider()
+
+    def enregistrerFlotte(self, flotte):
+        """ligne des poses courantes d'une Flotte"""
+        self.ajouter(t=flotte.t, x=flotte.x, y=flotte.y, theta=flotte.theta)
+
+    def enregistrerBanque(self, banque, t):
+        """ligne de l'état courant d'une BanqueMoteurs"""
+        self.ajouter(t=t, courant=banque.courant, vitesse=banque.vitesse)
+
+    def _vider(self):
+        if self._n == 0:
+            return
+        for nom, tampon in self._tampons.items():
+            fichier = '%s_%06d.npy' % (nom, len(self._segments[nom]))
+            np.save(os.path.join(self.dossier, fichier), tampon[:self._n])
+            self._segments[nom].append((fichier, self._n))
+        self._n = 0
+        self._ecrireIndex()
+
+    def _ecrireIndex(self):
+        index = {'taille_bloc': self.taille_bloc,
+                 'canaux': {nom: {'forme': list(t.shape[1:]), 'type': t.dtype.str,
+                                  'segments': self._segments[nom]}
+                            for nom, t in self._tampons.items()}}
+        temporaire = os.path.join(self.dossier, INDEX + '.tmp')
+        with open(temporaire, 'w') as f:
+            json.dump(index, f)
+        os.replace(temporaire, os.path.join(self.dossier, INDEX))   # index toujours cohérent sur disque
+
+    def fermer(self):
+        """écrit le dernier bloc, même incomplet"""
+        self._vider()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+
+class CanalJournal(object):
+    """Canal d'un journal vu comme un seul tableau : les blocs sont projetés en mémoire (memmap)
+    et seules les lignes demandées sont lues"""
+
+    def __init__(self, dossier, segments):
+        self._dossier = dossier
+        self._fichiers = [f for f, n in segments]
+        self._bornes = np.concatenate(((0,), np.cumsum([n for f, n in segments]))).astype(np.int64)
+        self._cartes = [None]*len(segments)
+
+    def __len__(self):
+        return int(self._bornes[-1])
+
+    def segment(self, k):
+        if self._cartes[k] is None:
+            self._cartes[k] = np.load(os.path.join(self._dossier, self._fichiers[k]), mmap_mode='r')
+        return self._cartes[k]
+
+    def segments(self):
+        """liste des blocs projetés en mémoire, sans copie"""
+        return [self.segment(k) for k in range(len(self._fichiers))]
+
+    def __getitem__(self, cle):
+        if isinstance(cle, tuple):
+            # lignes d'abord (seuls les blocs utiles sont lus), puis colonnes
+            lignes = self[cle[0]]
+            return lignes[(slice(None),) + cle[1:]] if isinstance(cle[0], slice) else lignes[cle[1:]]
+        n = len(self)
+        if isinstance(cle, slice):
+            debut, fin, pas = cle.indices(n)
+            if pas != 1:
+                return self[debut:fin][::pas]
+            morceaux = []
+            for k in range(len(self._fichiers)):
+                a, b = self._bornes[k], self._bornes[k+1]
+                if b <= debut or a >= fin:
+                    continue
+                morceaux.append(self.segment(k)[max(debut-a, 0):min(fin, b)-a])
+            if len(morceaux) == 1:
+                return morceaux[0]
+            if not morceaux:
+                return np.empty((0,) + self.segment(0).shape[1:]) if self._fichiers else np.empty(0)
+            return np.concatenate(morceaux)
+        if cle < 0:
+            cle += n
+        if not 0 <= cle < n:
+            raise IndexError('ligne hors journal')
+        k = int(np.searchsorted(self._bornes, cle, side='right')) - 1
+        return self.segment(k)[cle - self._bornes[k]]
+
+    def tableau(self):
+        """toutes les lignes (copiées en mémoire dès que le canal compte plusieurs blocs)"""
+        return self[:]
+
+
+class LecteurJournal(object):
+    """Relecture d'un journal écrit par EnregistreurJournal : journal['x'][i:j] ne lit que les blocs utiles"""
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        with open(os.path.join(dossier, INDEX)) as f:
+            self.index = json.load(f)
+        self._canaux = {}
+
+    def canaux(self):
+        return list(self.index['canaux'])
+
+    def __len__(self):
+        canaux = self.index['canaux']
+        return sum(n for f, n in next(iter(canaux.values()))['segments']) if canaux else 0
+
+    def __getitem__(self, nom):
+        if nom not in self._canaux:
+            self._canaux[nom] = CanalJournal(self.dossier, self.index['canaux'][nom]['segments'])
+        return self._canaux[nom]
@@ -1,28 +1,80 @@
 import numpy as np
 from math import pi, sin, cos
-from matplotlib import pyplot as plt
-from Kobuki_project.classes_meca import Vecteur3d
+from .classes_meca import Vecteur3d
+from .historique import HistoriquePose, VuePositions, VueOrientations
+from .MoteurCC import MoteurCC
+from .integrateurs import schema, integrerBloc
+from .instrumentation import Instruments, AttributInstruments
 
 
 class Kobuki(object):
     """Robot Mobile"""
 
+    instruments = AttributInstruments()
+
     def __init__(self, rayon=0.075, distance=0.35, pos=Vecteur3d(), ori=0, const=1, nom='tortue', c='green'):
 
-        self.pos = [pos]
+        self.historique = HistoriquePose(pos.x, pos.y, ori)  # poses x, y, theta et temps
         self.dist = distance    # dist entre les roues
         self.r = rayon  # rayon des roues
         self.vit_t = 0  # vitesse tout droit
         self.vit_r = 0
-        self.ori = [ori]     # orientation
-
-        a = self.r/2
-        b = self.r/self.dist
-        self.jacobian = np.array([[a, a], [b, -b]])
 
         self.const = const  # constante pour utiliser lors des randoms
         self.nom = nom
         self.color = c
+        self.moteurs = None     # (gauche, droit) après equiperMoteurs
+        self.reduction = 1.
+        self.integrateur = 'euler'  # schéma d'intégration de la pose, voir integrateurs.py
+        self.instruments = None
+
+    @property
+    def r(self):
+        return self._r
+
+    @r.setter
+    def r(self, rayon):
+        self._r = rayon
+        self._jacobian = None   # jacobiennes recalculées au prochain usage
+
+    @property
+    def dist(self):
+        return self._dist
+
+    @dist.setter
+    def dist(self, distance):
+        self._dist = distance
+        self._jacobian = None
+
+    def _calcJacobiennes(self):
+        a = self._r/2
+        b = self._r/self._dist
+        self._jacobian = np.array([[a, a], [b, -b]])
+        self._jacobian_inv = np.array([[1/(2*a), 1/(2*b)], [1/(2*a), -1/(2*b)]])
+
+    @property
+    def jacobian(self):
+        """jacobienne du mcd : (vit_trans, vit_rot) = J.(vd, vg)"""
+        if self._jacobian is None:
+            self._calcJacobiennes()
+        return self._jacobian
+
+    @property
+    def jacobian_inv(self):
+        """inverse de la jacobienne, utilisée par le mci"""
+        if self._jacobian is None:
+            self._calcJacobiennes()
+        return self._jacobian_inv
+
+    @property
+    def pos(self):
+        """positions successives, pos[-1] est la position courante"""
+        return VuePositions(self.historique)
+
+    @property
+    def ori(self):
+        """orientations successives, ori[-1] est l'orientation courante"""
+        return VueOrientations(self.historique)
 
     def __str__(self):
         msg = 'Kobuki(' + str(self.pos[-1]) + ',' + ')'
@@ -34,7 +86,10 @@ class Kobuki(object):
 
     def mcd(self, vg=0, vd=0):
         """Modèle cinématique direct : prend comme entrée les vitesses de rotation des roues droite et gauche
-        et calcule les vitesse de translation et rotation de la plateforme"""
+        et calcule les vitesse de translation et rotation de la plateforme.
+        vg peut aussi être un tableau (N,2) de commandes (vg, vd) : renvoie alors (N,2) de (vit_trans, vit_rot)"""
+        if np.ndim(vg) == 2:
+            return np.dot(np.asarray(vg, dtype=float)[:, ::-1], self.jacobian.T)
         vit_roues = np.array((vd, vg))
         vit_robot = np.dot(self.jacobian, vit_roues)
 
@@ -42,37 +97,105 @@ class Kobuki(object):
 
     def mci(self, vit_trans=0, vit_rot=0):
         """Modèle cinématique inverse : prend comme entrée les vitesse de translation et rotation de la plateforme
-        et calcule les vitesses de rotation des roues droite et gauche"""
+        et calcule les vitesses de rotation des roues droite et gauche.
+        vit_trans peut aussi être un tableau (N,2) de commandes (vit_trans, vit_rot) : renvoie alors (N,2) de (vd, vg)"""
+        if np.ndim(vit_trans) == 2:
+            return np.dot(np.asarray(vit_trans, dtype=float), self.jacobian_inv.T)
         vit_robot = np.array((vit_trans, vit_rot))
-        vit_roues = np.dot(np.linalg.inv(self.jacobian), vit_robot)
+        vit_roues = np.dot(self.jacobian_inv, vit_robot)
 
         return vit_roues
 
-    def simulMCD(self, dt, vg, vd):
+    def simulMCD(self, dt, vg, vd, integrateur=None):
         """Calcul de la position suivante après un pas de temps en fonction des entrées du mcd"""
         vit_rob = self.mcd(vg, vd)
-        self.ori.append(self.ori[-1]+dt*vit_rob[1])
-
-        dx = self.pos[-1].x+dt*vit_rob[0]*cos(self.ori[-1])
-        dy = self.pos[-1].y+dt*vit_rob[0]*sin(self.ori[-1])
-        self.pos.append(Vecteur3d(dx, dy))
-
-    def simulMCI(self, dt, vt, vr):
-        """Calcul de la position suivante après un pas de temps en fonction des entrées du mci"""
-        vit_roues = self.mci(vt, vr)
-        vit_rob = np.array((vt, vr))
-        self.ori.append(self.ori[-1]+dt*vit_rob[1])
-
-        dx = self.pos[-1].x+dt*vit_rob[0]*cos(self.ori[-1])
-        dy = self.pos[-1].y+dt*vit_rob[0]*sin(self.ori[-1])
-        self.pos.append(Vecteur3d(dx, dy))
+        self.simulMCI(dt, vit_rob[0], vit_rob[1], integrateur)
+
+    @Instruments.pasInstrumente('robots_avances', 'historique')
+    def simulMCI(self, dt, vt, vr, integrateur=None):
+        """Calcul de la position suivante après un pas de temps en fonction des entrées du mci.
+        integrateur : 'euler', 'point_milieu', 'rk4' ou 'arc' (self.integrateur par défaut)"""
+        x, y, theta, t = self.historique.derniere()
+        integrateur = integrateur or self.integrateur
+        if integrateur == 'euler':
+            theta = theta+dt*vr
+
+            dx = x+dt*vt*cos(theta)
+            dy = y+dt*vt*sin(theta)
+        else:
+            dx, dy, dtheta = schema(integrateur)(theta, vt, vr, dt)
+            dx, dy, theta = x+float(dx), y+float(dy), theta+float(dtheta)
+        if self.instruments is not None:
+            self.instruments.etape('cinematique')
+        self.historique.ajouter(dx, dy, theta, t+dt)
+
+    def equiperMoteurs(self, moteur_g=None, moteur_d=None, reduction=1.):
+        """Associe un MoteurCC à chaque roue (vitesse roue = vitesse moteur / reduction)"""
+        if moteur_g is None:
+            moteur_g = MoteurCC(0, self.nom + '_g')
+        if moteur_d is None:
+            moteur_d = MoteurCC(0, self.nom + '_d')
+        self.moteurs = (moteur_g, moteur_d)
+        self.reduction = reduction
+
+    def simulTension(self, dt, ug, ud, sous_pas=1):
+        """Pas de dt commandé en tensions moteur : les moteurs sont intégrés exactement (calcVit_zoh)
+        sur sous_pas sous-pas, puis la vitesse moyenne des roues sur le pas alimente simulMCD"""
+        mot_g, mot_d = self.moteurs
+        h = dt/sous_pas
+        vg = vd = 0.
+        for _ in range(sous_pas):
+            mot_g.calcVit_zoh(h, ug)
+            mot_d.calcVit_zoh(h, ud)
+            vg += mot_g._vitesse.dernier()
+            vd += mot_d._vitesse.dernier()
+        k = sous_pas*self.reduction
+        self.simulMCD(dt, vg/k, vd/k)
+
+    def etat(self, historique=False):
+        """état complet du robot (pose, géométrie, moteurs) sous forme de copies, pour un instantané"""
+        return {'historique': self.historique.etat(historique), 'r': self.r, 'dist': self.dist,
+                'const': self.const, 'reduction': self.reduction,
+                'moteurs': None if self.moteurs is None else [m.etat(historique) for m in self.moteurs]}
+
+    def restaurerEtat(self, etat):
+        self.historique.restaurerEtat(etat['historique'])
+        self.r = etat['r']
+        self.dist = etat['dist']
+        self.const = etat['const']
+        self.reduction = etat['reduction']
+        if etat['moteurs'] is None:
+            self.moteurs = None
+        else:
+            if self.moteurs is None:
+                self.equiperMoteurs(reduction=etat['reduction'])
+            for m, e in zip(self.moteurs, etat['moteurs']):
+                m.restaurerEtat(e)
+
+    @Instruments.pasInstrumente('robots_avances', 'historique', bloc=True)
+    def simulBloc(self, dt, vit_trans, vit_rot, integrateur=None):
+        """Intègre d'un coup une suite de commandes (translation, rotation), une par pas dt,
+        avec le même schéma que simulMCI (sommes cumulées) et écrit le bloc dans l'historique"""
+        x, y, theta, t = self.historique.derniere()
+        xs, ys, thetas = integrerBloc(integrateur or self.integrateur, x, y, theta, dt, vit_trans, vit_rot)
+        ts = t + np.cumsum(np.full(len(thetas), dt))
+        if self.instruments is not None:
+            self.instruments.elements = len(thetas)
+            self.instruments.etape('cinematique')
+        self.historique.ajouterBloc(xs, ys, thetas, ts)
+
+    def simulMCDBloc(self, dt, vg, vd, integrateur=None):
+        """Version vectorisée de simulMCD sur des tableaux de vitesses de roues"""
+        vg, vd = np.broadcast_arrays(np.asarray(vg, dtype=float), np.asarray(vd, dtype=float))
+        vit_rob = self.mcd(np.column_stack((vg, vd)))
+        self.simulBloc(dt, vit_rob[:, 0], vit_rob[:, 1], integrateur)
+
+    def simulMCIBloc(self, dt, vt, vr, integrateur=None):
+        """Version vectorisée de simulMCI sur des tableaux de vitesses de la plateforme"""
+        self.simulBloc(dt, vt, vr, integrateur)
 
     def trajectoire(self):
         """plot de la trajectoire du robot"""
-        trajx = []
-        trajy = []
-        for i in range(0, len(self.pos)):
-            trajx.append(self.pos[i].x)
-            trajy.append(self.pos[i].y)
-        plt.plot(trajx, trajy)  # color=self.color)
+        from matplotlib import pyplot as plt    # chargé au premier tracé seulement
+        plt.plot(self.historique.x, self.historique.y)  # color=self.color)
         plt.show()
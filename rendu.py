@@ -0,0 +1,246 @@
+import os
+import zlib
+import struct
+import threading
+import queue
+import numpy as np
+
+# couleurs (nom matplotlib utilisé par Kobuki.color -> RGB)
+COULEURS = {'red': (220, 30, 30), 'blue': (30, 60, 220), 'green': (30, 160, 60), 'black': (0, 0, 0),
+            'yellow': (230, 200, 0), 'orange': (255, 140, 0), 'magenta': (220, 0, 220),
+            'purple': (120, 40, 160), 'pink': (255, 130, 180), 'gray': (128, 128, 128)}
+
+
+def couleurRGB(nom):
+    if isinstance(nom, str):
+        return COULEURS.get(nom, COULEURS['gray'])
+    return tuple(nom)
+
+
+def ecrirePNG(chemin, image):
+    """Écrit une image (H,W,3) uint8 au format PNG sans dépendance extérieure (zlib seul)"""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    h, w = image.shape[:2]
+    lignes = np.zeros((h, 1 + 3*w), dtype=np.uint8)   # filtre 0 en tête de chaque ligne
+    lignes[:, 1:] = image.reshape(h, 3*w)
+
+    def bloc(type_bloc, donnees):
+        return (struct.pack('>I', len(donnees)) + type_bloc + donnees
+                + struct.pack('>I', zlib.crc32(type_bloc + donnees) & 0xffffffff))
+
+    with open(chemin, 'wb') as fichier:
+        fichier.write(b'\x89PNG\r\n\x1a\n')
+        fichier.write(bloc(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)))
+        fichier.write(bloc(b'IDAT', zlib.compress(lignes.tobytes(), 6)))
+        fichier.write(bloc(b'IEND', b''))
+
+
+class RenduHorsEcran(object):
+    """Dessine la flotte dans un tableau NumPy RGB (H,W,3), sans fenêtre ni pygame :
+    un disque par robot et un trait dans la direction de son orientation.
+    pixel = origine + echelle*(x, y)"""
+
+    def __init__(self, largeur=800, hauteur=800, echelle=1., origine=(0, 0), rayon=8, fond=(255, 255, 255)):
+        self.largeur = largeur
+        self.hauteur = hauteur
+        self.echelle = echelle
+        self.origine = origine
+        self.rayon = rayon
+        if isinstance(fond, np.ndarray):
+            self.fond = np.ascontiguousarray(fond[:hauteur, :largeur, :3], dtype=np.uint8)
+        else:
+            self.fond = np.empty((hauteur, largeur, 3), dtype=np.uint8)
+            self.fond[:] = fond
+        # décalages des pixels du disque et des points du trait d'orientation
+        d = np.arange(-rayon, rayon+1)
+        dy, dx = np.meshgrid(d, d, indexing='ij')
+        dans = dx**2 + dy**2 <= rayon**2
+        self._disque_dx = dx[dans]
+        self._disque_dy = dy[dans]
+        self._trait = np.arange(0, 2*rayon+1)
+
+    def image(self, x, y, theta, couleurs=None):
+        """Image RGB de la flotte aux poses (x, y, theta), tableaux (N,) ; couleurs (N,3) ou None"""
+        img = self.fond.copy()
+        px = self.origine[0] + self.echelle*np.asarray(x, dtype=float)
+        py = self.origine[1] + self.echelle*np.asarray(y, dtype=float)
+        n = px.shape[0]
+        if couleurs is None:
+            couleurs = np.full((n, 3), COULEURS['green'], dtype=np.uint8)
+        couleurs = np.asarray(couleurs, dtype=np.uint8)
+
+        cx = np.rint(px).astype(np.intp)[:, None]
+        cy = np.rint(py).astype(np.intp)[:, None]
+        self._poser(img, cx + self._disque_dx, cy + self._disque_dy, couleurs)
+
+        theta = np.asarray(theta, dtype=float)[:, None]
+        tx = np.rint(px[:, None] + np.cos(theta)*self._trait).astype(np.intp)
+        ty = np.rint(py[:, None] + np.sin(theta)*self._trait).astype(np.intp)
+        self._poser(img, tx, ty, np.zeros((n, 3), dtype=np.uint8))
+        return img
+
+    def _poser(self, img, ix, iy, couleurs):
+        """colorie les pixels (ix, iy) de forme (N,K) avec la couleur de chaque robot, hors cadre ignoré"""
+        dedans = (ix >= 0) & (ix < self.largeur) & (iy >= 0) & (iy < self.hauteur)
+        rob = np.broadcast_to(np.arange(ix.shape[0])[:, None], ix.shape)
+        img[iy[dedans], ix[dedans]] = couleurs[rob[dedans]]
+
+    def surface(self, x, y, theta, couleurs=None):
+        """Même image sous forme de pygame.Surface en mémoire (sans fenêtre)"""
+        import pygame.surfarray
+        return pygame.surfarray.make_surface(self.image(x, y, theta, couleurs).swapaxes(0, 1))
+
+
+class AtlasSprites(object):
+    """Sprite du robot pré-tourné pour nb_angles orientations, construit une fois au démarrage.
+    angle_image : orientation (rad) du robot sur l'image d'origine. L'axe y de l'écran étant
+    dirigé vers le bas, une orientation theta correspond à une rotation pygame de -theta."""
+
+    def __init__(self, image, nb_angles=72, angle_image=0.):
+        import pygame.transform
+        self.nb_angles = nb_angles
+        self.images = [pygame.transform.rotate(image, -np.degrees(2*np.pi*k/nb_angles - angle_image))
+                       for k in range(nb_angles)]
+        self.demi_l = np.array([img.get_width()//2 for img in self.images])
+        self.demi_h = np.array([img.get_height()//2 for img in self.images])
+
+    def indices(self, theta):
+        """indice de l'image la plus proche pour chaque orientation (tableau (N,))"""
+        return np.rint(np.asarray(theta)*(self.nb_angles/(2*np.pi))).astype(np.intp) % self.nb_angles
+
+
+class RenduFlotte(object):
+    """Affichage pygame de la flotte par rectangles modifiés : à chaque image, seules les zones
+    occupées par les robots à l'image précédente et à la nouvelle sont redessinées et envoyées à l'écran.
+    pixel = origine + echelle*(x, y)"""
+
+    def __init__(self, ecran, fond, atlas, echelle=1., origine=(0, 0)):
+        self.ecran = ecran
+        self.fond = fond
+        self.atlas = atlas
+        self.echelle = echelle
+        self.origine = origine
+        self._anciens = None
+
+    def dessiner(self, x, y, theta):
+        import pygame
+        px = np.rint(self.origine[0] + self.echelle*np.asarray(x)).astype(np.intp)
+        py = np.rint(self.origine[1] + self.echelle*np.asarray(y)).astype(np.intp)
+        k = self.atlas.indices(theta)
+        gauche = (px - self.atlas.demi_l[k]).tolist()
+        haut = (py - self.atlas.demi_h[k]).tolist()
+        images = [self.atlas.images[i] for i in k.tolist()]
+
+        if self._anciens is None:
+            # première image : tout le fond une seule fois
+            self.ecran.blit(self.fond, (0, 0))
+            nouveaux = self.ecran.blits(list(zip(images, zip(gauche, haut))))
+            pygame.display.flip()
+        else:
+            self.ecran.blits([(self.fond, r, r) for r in self._anciens], doreturn=False)
+            nouveaux = self.ecran.blits(list(zip(images, zip(gauche, haut))))
+            pygame.display.update(self._anciens + nouveaux)
+        self._anciens = nouveaux
+
+
+class ExportImages(object):
+    """Export de séquences d'images pendant ou après une simulation. Le fil de calcul ne fait que
+    copier les poses d'une image sur pas ; le dessin et l'écriture se font dans un fil de travail.
+    format 'png' : une image par fichier ; 'npy' : blocs (k,H,W,3) de taille_bloc images.
+    Au plus taille_file images attendent le fil de travail (ajouter bloque au-delà) ; une erreur
+    du fil de travail est relancée par l'appel suivant à ajouter ou par fermer."""
+
+    def __init__(self, dossier, rendu=None, pas=1, format='png', taille_bloc=64, couleurs=None, taille_file=32):
+        if format not in ('png', 'npy'):
+            raise ValueError('format inconnu : ' + str(format))
+        os.makedirs(dossier, exist_ok=True)
+        self.dossier = dossier
+        self.rendu = rendu if rendu is not None else RenduHorsEcran()
+        self.pas = pas
+        self.format = format
+        self.taille_bloc = taille_bloc
+        self.couleurs = couleurs
+        self.nb_soumises = 0
+        self.nb_ecrites = 0
+        self._compteur = 0
+        self._erreur = None
+        self._file = queue.Queue(maxsize=taille_file)
+        self._fil = threading.Thread(target=self._travail, daemon=True)
+        self._fil.start()
+
+    def ajouter(self, x, y, theta):
+        """à appeler à chaque pas de simulation ; seule une pose sur pas est rendue"""
+        if self._erreur is not None:
+            raise self._erreur
+        if self._compteur % self.pas == 0:
+            self._file.put((self.nb_soumises, np.array(x, dtype=float), np.array(y, dtype=float),
+                            np.array(theta, dtype=float)))
+            self.nb_soumises += 1
+        self._compteur += 1
+
+    def _travail(self):
+        bloc = []
+        numero_bloc = 0
+        while True:
+            element = self._file.get()
+            if element is None:
+                break
+            if self._erreur is not None:
+                continue    # après une erreur, la file est seulement vidée pour ne pas bloquer ajouter
+            try:
+                i, x, y, theta = element
+                img = self.rendu.image(x, y, theta, self.couleurs)
+                if self.format == 'png':
+                    ecrirePNG(os.path.join(self.dossier, 'image_%06d.png' % i), img)
+                else:
+                    bloc.append(img)
+                    if len(bloc) == self.taille_bloc:
+                        np.save(os.path.join(self.dossier, 'images_%04d.npy' % numero_bloc), np.stack(bloc))
+                        bloc = []
+                        numero_bloc += 1
+                self.nb_ecrites += 1
+            except Exception as e:
+                self._erreur = e
+        if bloc and self._erreur is None:
+            try:
+                np.save(os.path.join(self.dossier, 'images_%04d.npy' % numero_bloc), np.stack(bloc))
+            except Exception as e:
+                self._erreur = e
+
+    def fermer(self):
+        """attend la fin de l'écriture de toutes les images soumises ; relance l'erreur éventuelle du fil de travail"""
+        if self._fil.is_alive():
+            self._file.put(None)
+            self._fil.join()
+        if self._erreur is not None:
+            raise self._erreur
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_exc, *exc):
+        if type_exc is None:
+            self.fermer()
+        else:
+            try:
+                self.fermer()
+            except Exception:
+                pass    # l'exception du bloc with prime sur celle du fil de travail
+
+
+def exporterHistoriques(robots, dossier, pas=1, **options):
+    """Exporte les images d'une simulation enregistrée à partir des historiques des Kobuki
+    (un robot dont l'historique est plus court reste à sa dernière pose)"""
+    robots = list(robots)
+    if not robots:
+        return 0
+    n = max(len(r.historique) for r in robots)
+    indices = [np.minimum(np.arange(0, n, pas), len(r.historique)-1) for r in robots]
+    X = np.stack([r.historique.x[i] for r, i in zip(robots, indices)], axis=1)
+    Y = np.stack([r.historique.y[i] for r, i in zip(robots, indices)], axis=1)
+    T = np.stack([r.historique.theta[i] for r, i in zip(robots, indices)], axis=1)
+    options.setdefault('couleurs', np.array([couleurRGB(r.color) for r in robots], dtype=np.uint8))
+    with ExportImages(dossier, pas=1, **options) as export:
+        for k in range(X.shape[0]):
+            export.ajouter(X[k], Y[k], T[k])
+    return X.shape[0]